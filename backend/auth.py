@@ -1,3 +1,8 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
@@ -10,15 +15,29 @@ from models import TokenData, UserModel
 SECRET_KEY = "retail_app_secret_key_change_me"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 300
+# Authenticated users are cached in-process this long, keyed by token subject (email)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_user_cache = OrderedDict() # email -> (expires_at, UserModel), in expiry order
+
+# bcrypt cost factor (log2 rounds); each +1 doubles hashing time. Existing hashes keep their own cost.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads for hashing/verification. bcrypt releases the GIL, so this caps how many cores a login storm can take
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", "2"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_THREADS, thread_name_prefix="bcrypt")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login") # Endpoint is /login
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    """Runs bcrypt on the hashing pool so the event loop keeps serving other requests."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify, plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -45,7 +64,32 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
+    cached = _user_cache.get(token_data.email)
+    if cached is not None:
+        if cached[0] > time.monotonic():
+            # Copy so a handler mutating its user can't change what other requests see
+            return cached[1].model_copy(deep=True)
+        del _user_cache[token_data.email]
+
     user = await db.users.find_one({"email": token_data.email})
     if user is None:
         raise credentials_exception
-    return UserModel(**user)
+    user = UserModel(**user)
+    if USER_CACHE_TTL_SECONDS > 0:
+        _cache_user(token_data.email, user)
+    return user
+
+def _cache_user(email, user):
+    now = time.monotonic()
+    _user_cache.pop(email, None)
+    _user_cache[email] = (now + USER_CACHE_TTL_SECONDS, user.model_copy(deep=True))
+    # One TTL for everyone, so the front holds the expired entries, then the oldest
+    while _user_cache:
+        expires_at, _ = next(iter(_user_cache.values()))
+        if expires_at > now and len(_user_cache) <= USER_CACHE_MAX_ENTRIES:
+            break
+        _user_cache.popitem(last=False)
+
+def invalidate_user(email):
+    """Drops a cached user; call after writing to their record (e.g. /colors)."""
+    _user_cache.pop(email, None)
@@ -1,4 +1,9 @@
+import cv2
+import numpy as np
 from PIL import Image
+from cutout_cache import cutout_cache
+from image_hash import content_hash
+from rembg_sessions import session_pool, REMBG_MODEL
 try:
     from rembg import remove
     HAS_REMBG = True
@@ -6,30 +11,59 @@ except Exception as e:
     print(f"Warning: rembg could not be imported: {e}")
     HAS_REMBG = False
 
-def remove_bg_simple(img: Image.Image, bg_color=(255, 255, 255), tol=20):
+def _edge_connected(mask):
+    """Keeps only the mask regions that touch the image border (4-connected)."""
+    n, labels = cv2.connectedComponents(mask.astype(np.uint8), connectivity=4)
+    if n <= 1:
+        return mask
+    border = np.concatenate((labels[0, :], labels[-1, :], labels[:, 0], labels[:, -1]))
+    border = np.unique(border[border > 0])
+    return np.isin(labels, border)
+
+def remove_bg_simple(img: Image.Image, bg_color=(255, 255, 255), tol=20, edge_connected=False):
+    """
+    Makes pixels within `tol` of `bg_color` (per channel) transparent.
+    With `edge_connected`, only background connected to the image border is removed,
+    so white areas inside the product (labels, caps) survive.
+    """
     img = img.convert("RGBA")
-    datas = img.getdata()
-
-    new_data = []
-    for r, g, b, a in datas:
-        if (
-            abs(r - bg_color[0]) < tol and
-            abs(g - bg_color[1]) < tol and
-            abs(b - bg_color[2]) < tol
-        ):
-            new_data.append((r, g, b, 0))
-        else:
-            new_data.append((r, g, b, a))
-
-    img.putdata(new_data)
+    arr = np.asarray(img)
+
+    # One pass per channel keeps temporaries at HxW instead of HxWx3
+    mask = np.ones(arr.shape[:2], dtype=bool)
+    for c in range(3):
+        mask &= np.abs(arr[..., c].astype(np.int16) - bg_color[c]) < tol
+
+    if edge_connected:
+        mask = _edge_connected(mask)
+
+    alpha = arr[..., 3].copy()
+    alpha[mask] = 0
+    img.putalpha(Image.fromarray(alpha, "L"))
     return img
 
 def remove_bg(img: Image.Image) -> Image.Image:
+    # Cutouts are cached by pixel content, so the same packshot is only segmented once
+    # across formats, colour variants and repeat uploads.
+    method = f"rembg:{REMBG_MODEL}" if HAS_REMBG else "simple"
+    key = content_hash(img, namespace=method)
+    cached = cutout_cache.get(key)
+    if cached is not None:
+        return cached
+
     if HAS_REMBG:
         try:
-            return remove(img)
+            if session_pool is not None:
+                with session_pool.session() as session:
+                    result = remove(img, session=session)
+            else:
+                result = remove(img)
         except Exception as e:
             print(f"rembg failed: {e}, falling back to simple removal")
+            # Don't cache the fallback under the rembg key; the next call should retry rembg.
             return remove_bg_simple(img)
     else:
-        return remove_bg_simple(img)
+        result = remove_bg_simple(img)
+
+    cutout_cache.put(key, result)
+    return result
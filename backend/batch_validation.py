@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+
+from validator import validate_spec, validate_text_content
+
+# Rows validated per thread hop when streaming from the API
+BATCH_CHUNK_ROWS = 2000
+# Spec flags that arrive as strings in CSV decks
+BOOLEAN_KEYS = ("confirm_people", "confirm_drinkaware", "is_alcohol")
+# Spec fields the validators treat as text; JSONL rows must give them as strings
+TEXT_KEYS = (
+    "main_message", "sub_message", "cta_text", "value_tile_type", "value_tile_text",
+    "tesco_tag", "clubcard_date", "clubcard_price", "background_color", "template",
+)
+
+
+def validate_copy(spec):
+    """
+    Text-only verdict for one spec: the checks /generate-images runs before it touches the images
+    (validate_spec, failing fast, then validate_text_content).
+    """
+    spec_errors = validate_spec(spec)
+    if spec_errors:
+        return {"valid": False, "errors": spec_errors, "warnings": []}
+    return validate_text_content(
+        spec.get("main_message", ""),
+        spec.get("sub_message", ""),
+        spec.get("cta_text", ""),
+    )
+
+
+def iter_specs(lines, format="jsonl"):
+    """
+    Parses a JSONL or CSV copy deck lazily from an iterable of text lines.
+    Yields (row_number, spec, error); spec is None when the row couldn't be parsed
+    (including JSONL rows whose TEXT_KEYS aren't strings).
+    CSV columns are spec keys (header row required); empty cells are left out of the spec
+    and BOOLEAN_KEYS are parsed from true/false/yes/no/1/0.
+    """
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for row, record in enumerate(reader, start=1):
+            spec = {k: v for k, v in record.items() if k and v not in (None, "")}
+            for key in BOOLEAN_KEYS:
+                if key in spec:
+                    spec[key] = spec[key].strip().lower() in ("1", "true", "yes", "y")
+            yield row, spec, None
+        return
+
+    for row, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            spec = json.loads(line)
+        except ValueError as e:
+            yield row, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(spec, dict):
+            yield row, None, "Each line must be a JSON object."
+            continue
+        bad = [key for key in TEXT_KEYS if key in spec and not isinstance(spec[key], str)]
+        if bad:
+            yield row, None, f"Field(s) {', '.join(bad)} must be strings."
+            continue
+        yield row, spec, None
+
+
+def validate_batch(lines, format="jsonl"):
+    """
+    Python API: streams a JSONL/CSV deck through validate_copy.
+    Yields one result per row: {"row", "id" (if the spec has one), "valid", "errors", "warnings", "hits"}.
+    A row that can't be validated becomes an invalid result; it never ends the stream.
+    """
+    for row, spec, error in iter_specs(lines, format):
+        if spec is None:
+            yield {"row": row, "valid": False, "errors": [error], "warnings": []}
+            continue
+        result = {"row": row}
+        if "id" in spec:
+            result["id"] = spec["id"]
+        try:
+            result.update(validate_copy(spec))
+        except Exception as e:
+            result.update({"valid": False, "errors": [f"Could not validate row: {e}"], "warnings": []})
+        yield result
+
+
+def detect_format(filename, format=None):
+    if format:
+        return format.lower()
+    return "csv" if filename and filename.lower().endswith(".csv") else "jsonl"
+
+
+def ndjson_chunks(binary_file, format="jsonl", chunk_rows=BATCH_CHUNK_ROWS):
+    """
+    Generator of NDJSON byte chunks (one per `chunk_rows` rows) read from a binary file object.
+    Meant to be advanced via asyncio.to_thread so large decks never block the event loop.
+    """
+    # newline="" lets the csv module handle quoted multi-line cells
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    buf = []
+    for result in validate_batch(text, format):
+        buf.append(json.dumps(result))
+        if len(buf) >= chunk_rows:
+            yield ("\n".join(buf) + "\n").encode()
+            buf = []
+    if buf:
+        yield ("\n".join(buf) + "\n").encode()
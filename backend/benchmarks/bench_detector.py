@@ -0,0 +1,116 @@
+"""
+Benchmark: detector.analyze (cascade loaded once, shared grayscale, downscaled bottle pass) vs the
+original face + bottle detection that reloaded the cascade on every call. Exits 1 if any verdict
+differs, including on a small (~50px) face in a large photo.
+
+face.png is a crop of NASA's public-domain astronaut portrait (as shipped with scikit-image).
+
+Usage (from backend/):
+    python benchmarks/bench_detector.py --sizes 2000x2000,4000x3000,6000x4000 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+import detector
+
+FACE_CROP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "face.png")
+# Width of the face inside face.png (the crop is padded around it)
+FACE_CROP_FACE_PX = 95
+
+
+def analyze_legacy(img):
+    """The pre-detector implementation, kept here as the reference."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=10, minSize=(40, 40))
+    if len(faces) > 0:
+        return {"faces": True, "bottle": False}
+
+    height, width, _ = img.shape
+    img_area = height * width
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    edges = cv2.Canny(gray, 50, 150)
+    dilated = cv2.dilate(edges, np.ones((5, 5), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    for cnt in contours:
+        area = cv2.contourArea(cnt)
+        if area < (img_area * 0.005) or area > (img_area * 0.9):
+            continue
+        x, y, w, h = cv2.boundingRect(cnt)
+        if 1.5 < float(h) / w < 6.5 and 0.4 < float(area) / (w * h) < 0.85:
+            return {"faces": False, "bottle": True}
+    return {"faces": False, "bottle": False}
+
+
+def make_photo(w, h, bottle, seed=0, face_px=0):
+    """
+    Textured studio-style photo (sensor noise + gradient) with an optional bottle silhouette
+    and an optional face about `face_px` wide.
+    """
+    rng = np.random.default_rng(seed)
+    grad = np.linspace(200, 245, h, dtype=np.float32)[:, None, None]
+    img = np.clip(grad + rng.normal(0, 6, (h, w, 3)), 0, 255).astype(np.uint8)
+    if bottle:
+        cx, bw = w // 2, w // 8
+        # Body, shoulder and neck
+        cv2.rectangle(img, (cx - bw // 2, int(h * 0.35)), (cx + bw // 2, int(h * 0.9)), (40, 80, 30), -1)
+        pts = np.array([[cx - bw // 2, int(h * 0.35)], [cx - bw // 6, int(h * 0.25)], [cx + bw // 6, int(h * 0.25)], [cx + bw // 2, int(h * 0.35)]])
+        cv2.fillPoly(img, [pts], (40, 80, 30))
+        cv2.rectangle(img, (cx - bw // 6, int(h * 0.1)), (cx + bw // 6, int(h * 0.25)), (40, 80, 30), -1)
+    if face_px:
+        crop = cv2.imread(FACE_CROP)
+        size = round(crop.shape[1] * face_px / FACE_CROP_FACE_PX)
+        crop = cv2.resize(crop, (size, size), interpolation=cv2.INTER_AREA)
+        x, y = w // 3, h // 3
+        img[y:y + size, x:x + size] = crop
+    return img
+
+
+def timed(fn, img, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(img)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="2000x2000,4000x3000,6000x4000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-dim", type=int, default=detector.DETECTOR_MAX_DIM)
+    parser.add_argument("--face-max-dim", type=int, default=detector.DETECTOR_FACE_MAX_DIM)
+    parser.add_argument("--face-px", type=int, default=50, help="Face width in the small-face case")
+    args = parser.parse_args()
+
+    detector.face_cascade() # Exclude the one-off cascade load, as a warm worker would
+    print(f"Working copy max dim: {args.max_dim}px (faces: {args.face_max_dim or 'full'}), best of {args.repeat}")
+    mismatches = 0
+    for size in args.sizes.split(","):
+        w, h = (int(v) for v in size.lower().split("x"))
+        cases = {"plain ": {}, "bottle": {"bottle": True}, f"face{args.face_px}": {"face_px": args.face_px}}
+        for case, kwargs in cases.items():
+            img = make_photo(w, h, kwargs.get("bottle", False), face_px=kwargs.get("face_px", 0))
+            t_old, old = timed(analyze_legacy, img, args.repeat)
+            t_new, new = timed(lambda i: detector.analyze(i, max_dim=args.max_dim, face_max_dim=args.face_max_dim), img, args.repeat)
+            same = old == {"faces": bool(new["faces"]), "bottle": new["bottle"] is not None}
+            if kwargs.get("face_px") and not old["faces"]:
+                print(f"  {w}x{h} {case}: reference didn't find the face; case is not meaningful")
+            mismatches += not same
+            label = f"{w}x{h} {case}"
+            print(f"  {label}: legacy {t_old * 1000:8.1f} ms | detector {t_new * 1000:7.1f} ms ({t_old / t_new:5.1f}x)  same result: {same}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
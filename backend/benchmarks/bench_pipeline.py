@@ -0,0 +1,171 @@
+"""
+Micro-benchmark suite for the render pipeline, on the deterministic fixtures in fixtures.py.
+
+Times each stage separately: background removal, product grouping, composition per
+format and spec path (standard/CTA/Clubcard/LEP/alcohol), PNG/JPEG export per format,
+and text/image compliance checks. Caches are cleared before every timed run, except for
+the explicitly "cached" cases and the JPEG quality seed (steady state, as in a warm worker).
+
+Usage (from backend/):
+    python benchmarks/bench_pipeline.py                       # run and print
+    python benchmarks/bench_pipeline.py --save-baseline       # write benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --compare             # exit 1 on regressions vs the baseline
+    python benchmarks/bench_pipeline.py --filter compose --repeat 10
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import cv2
+import numpy as np
+import PIL
+from PIL import Image
+
+from fixtures import PACKSHOT_SIZES, SPECS, TEXT_CASES, make_packshot, make_logo
+from formats import FORMATS
+from background_removal import remove_bg, remove_bg_simple, HAS_REMBG
+from background_generator import generate_background
+from composer import create_product_group, compose_creative, prepare_assets
+from cutout_cache import cutout_cache
+from exporter import export_image
+from validator import validate_text_content, validate_image_content, clear_image_validation_cache
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+
+
+def measure(fn, repeat, setup=None):
+    """Runs fn() `repeat` times (after one warm-up), calling setup() untimed before each run."""
+    if setup:
+        setup()
+    fn()
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": round(statistics.median(times), 3), "min_ms": round(min(times), 3), "runs": repeat}
+
+
+def build_cases():
+    """[(name, fn, setup)] for every benchmark in the suite."""
+    cases = []
+    logo = make_logo()
+    packshots = {name: make_packshot(w, h, seed=i) for i, (name, (w, h)) in enumerate(PACKSHOT_SIZES.items())}
+    bottle = make_packshot(*PACKSHOT_SIZES["medium"], seed=7, kind="bottle")
+
+    # Background removal
+    for name, img in packshots.items():
+        cases.append((f"remove_bg_simple/{name}", lambda img=img: remove_bg_simple(img), None))
+        cases.append((f"remove_bg/{name}", lambda img=img: remove_bg(img), cutout_cache.clear))
+    cases.append(("remove_bg/medium_cached", lambda: remove_bg(packshots["medium"]), None))
+
+    # Product grouping (three products, as the upload form allows)
+    trio = [packshots["medium"], bottle, packshots["small"]]
+    cutouts = [remove_bg(p) for p in trio]
+    cases.append(("create_product_group/3_products", lambda: create_product_group(trio), cutout_cache.clear))
+    cases.append(("create_product_group/3_products_precut", lambda: create_product_group(cutouts, already_cut=True), None))
+
+    # Composition: every spec path x every format, sharing one preparation stage like generate_all
+    products = [packshots["medium"]]
+    prepared = prepare_assets(products, logo, widths=[W for W, _ in FORMATS.values()])
+    composed = {}
+    for spec_name, spec in SPECS.items():
+        for fmt, (W, H) in FORMATS.items():
+            bg = generate_background("clean", W, H, custom_color=spec.get("background_color"))
+            run = lambda bg=bg, spec=spec, fmt=fmt: compose_creative(bg, products, logo, dict(spec), fmt, prepared=prepared)
+            cases.append((f"compose_creative/{spec_name}/{fmt}", run, None))
+            if spec_name == "standard":
+                composed[fmt] = run()
+
+    # Export
+    for fmt, img in composed.items():
+        cases.append((f"export_image/png/{fmt}", lambda img=img: export_image(img, format="PNG"), None))
+        cases.append((f"export_image/jpeg/{fmt}", lambda img=img: export_image(img, format="JPEG", max_size_kb=500), None))
+
+    # Compliance
+    for name, (main, sub, cta) in TEXT_CASES.items():
+        cases.append((f"validate_text_content/{name}", lambda m=main, s=sub, c=cta: validate_text_content(m, s, c), None))
+    for name, img in packshots.items():
+        cases.append((f"validate_image_content/{name}", lambda img=img: validate_image_content(img), clear_image_validation_cache))
+    cases.append(("validate_image_content/bottle", lambda: validate_image_content(bottle), clear_image_validation_cache))
+    cases.append(("validate_image_content/medium_cached", lambda: validate_image_content(packshots["medium"]), None))
+    return cases
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "rembg": HAS_REMBG,
+        "formats": FORMATS,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Names of benchmarks whose median regressed by more than `tolerance` (a fraction) vs the baseline."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = result["median_ms"] / base["median_ms"] if base["median_ms"] else 1.0
+        marker = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"  {name:55s} {base['median_ms']:10.2f} -> {result['median_ms']:10.2f} ms  ({ratio:5.2f}x) {marker}")
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="Also write this run's results as JSON to this path")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Write results as the new baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="Compare against a baseline; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"Render pipeline benchmarks, median of {args.repeat}")
+    for name, fn, setup in build_cases():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(fn, args.repeat, setup)
+        print(f"  {name:55s} {results[name]['median_ms']:10.2f} ms  (min {results[name]['min_ms']:.2f})")
+
+    report = {"environment": environment(), "repeat": args.repeat, "results": results}
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (tolerance {args.tolerance:.0%})")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: vectorized remove_bg_simple vs the original per-pixel loop.
+
+Usage (from backend/):
+    python benchmarks/bench_remove_bg.py --size 4000x3000 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw
+from background_removal import remove_bg_simple
+
+
+def remove_bg_simple_loop(img, bg_color=(255, 255, 255), tol=20):
+    """The pre-NumPy implementation, kept here as the reference."""
+    img = img.convert("RGBA")
+    datas = img.getdata()
+
+    new_data = []
+    for r, g, b, a in datas:
+        if (
+            abs(r - bg_color[0]) < tol and
+            abs(g - bg_color[1]) < tol and
+            abs(b - bg_color[2]) < tol
+        ):
+            new_data.append((r, g, b, 0))
+        else:
+            new_data.append((r, g, b, a))
+
+    img.putdata(new_data)
+    return img
+
+
+def make_packshot(w, h):
+    """White studio background with a product-like shape and a white label inside it."""
+    img = Image.new("RGB", (w, h), (252, 252, 250))
+    d = ImageDraw.Draw(img)
+    d.rounded_rectangle([w * 0.3, h * 0.1, w * 0.7, h * 0.9], radius=w // 20, fill=(180, 30, 40))
+    d.rectangle([w * 0.38, h * 0.4, w * 0.62, h * 0.6], fill=(255, 255, 255))
+    return img
+
+
+def timed(fn, img, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(img)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", default="4000x3000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--skip-loop", action="store_true", help="Skip the slow reference loop")
+    args = parser.parse_args()
+
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    img = make_packshot(w, h)
+    print(f"Image: {w}x{h} ({w * h / 1e6:.1f} MP), best of {args.repeat}")
+
+    t_vec, out_vec = timed(remove_bg_simple, img, args.repeat)
+    print(f"  numpy:           {t_vec * 1000:9.1f} ms")
+
+    t_edge, _ = timed(lambda i: remove_bg_simple(i, edge_connected=True), img, args.repeat)
+    print(f"  numpy+edge fill: {t_edge * 1000:9.1f} ms")
+
+    if not args.skip_loop:
+        t_loop, out_loop = timed(remove_bg_simple_loop, img, 1)
+        print(f"  python loop:     {t_loop * 1000:9.1f} ms  ({t_loop / t_vec:.0f}x slower)")
+        same = out_loop.tobytes() == out_vec.tobytes()
+        print(f"  identical output: {same}")
+        if not same:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
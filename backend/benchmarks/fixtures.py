@@ -0,0 +1,91 @@
+"""
+Deterministic synthetic fixtures for the benchmarks: packshots, logos and specs.
+Everything is drawn from fixed seeds, so every run (and every machine) times the same inputs.
+"""
+import numpy as np
+from PIL import Image, ImageDraw
+
+# (width, height) of generated packshots
+PACKSHOT_SIZES = {
+    "small": (600, 800),
+    "medium": (1500, 2000),
+    "large": (3000, 4000),
+}
+
+SPECS = {
+    "standard": {
+        "main_message": "Fresh taste every day",
+        "sub_message": "Made with British milk",
+        "background_color": "#A8DAEF",
+    },
+    "cta": {
+        "main_message": "Discover the new range",
+        "sub_message": "Crafted for weekends",
+        "cta_text": "Learn more",
+        "background_color": "#FFDD00",
+        "tesco_tag": "Only at Tesco",
+    },
+    "clubcard": {
+        "main_message": "Summer favourites",
+        "sub_message": "Available in selected stores. Clubcard/app required. Ends 12/08",
+        "background_color": "#FFFFFF",
+        "value_tile_type": "Clubcard Value Tile",
+        "clubcard_price": "£1.50",
+        "regular_price": "£2.00",
+        "clubcard_date": "12/08",
+    },
+    "lep": {
+        "main_message": "Everyday essentials",
+        "sub_message": "Quality you can count on",
+        "template": "LEP",
+        "background_color": "#FFFFFF",
+        "tesco_tag": "Selected stores. While stocks last.",
+    },
+    "alcohol": {
+        "main_message": "Crisp pale ale",
+        "sub_message": "Brewed in small batches",
+        "background_color": "#1E3A5F",
+        "is_alcohol": True,
+    },
+}
+
+# Copy used for the text-compliance timings: one clean row and one long row with violations
+TEXT_CASES = {
+    "clean": ("Fresh taste every day", "Made with British milk", "Learn more"),
+    "violations": (
+        "Win a prize in our summer competition " * 8,
+        "Terms and conditions apply. Only £5, save 20% with this special offer " * 8,
+        "Enter now",
+    ),
+}
+
+
+def make_packshot(w, h, seed=0, kind="box"):
+    """
+    Studio packshot on an off-white background with light sensor noise.
+    `kind` is "box" (carton with a white label) or "bottle" (body, shoulders and neck).
+    """
+    rng = np.random.default_rng(seed)
+    base = np.full((h, w, 3), (250, 250, 248), dtype=np.float32)
+    noise = rng.normal(0, 2.0, (h, w, 1))
+    img = Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+    d = ImageDraw.Draw(img)
+    colour = tuple(int(c) for c in rng.integers(20, 200, 3))
+    if kind == "bottle":
+        cx, bw = w // 2, w // 4
+        d.rectangle([cx - bw // 2, h * 0.35, cx + bw // 2, h * 0.92], fill=colour)
+        d.polygon([(cx - bw // 2, h * 0.35), (cx - bw // 6, h * 0.22), (cx + bw // 6, h * 0.22), (cx + bw // 2, h * 0.35)], fill=colour)
+        d.rectangle([cx - bw // 6, h * 0.08, cx + bw // 6, h * 0.22], fill=colour)
+    else:
+        d.rounded_rectangle([w * 0.25, h * 0.1, w * 0.75, h * 0.9], radius=w // 25, fill=colour)
+        d.rectangle([w * 0.33, h * 0.4, w * 0.67, h * 0.6], fill=(255, 255, 255))
+    return img
+
+
+def make_logo(w=600, h=240):
+    """Transparent logo: a blue wordmark-like bar with a yellow underline."""
+    logo = Image.new("RGBA", (w, h), (0, 0, 0, 0))
+    d = ImageDraw.Draw(logo)
+    d.rounded_rectangle([0, 0, w - 1, int(h * 0.7)], radius=h // 6, fill=(0, 83, 159, 255))
+    d.rectangle([w * 0.1, h * 0.8, w * 0.9, h * 0.9], fill=(238, 28, 46, 255))
+    return logo
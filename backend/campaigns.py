@@ -0,0 +1,63 @@
+import os
+import posixpath
+import threading
+import zipfile
+
+# --- CONFIG ---
+# Manifest rows rendering at once. Rows beyond this wait, so memory stays bounded by in-flight rows.
+CAMPAIGN_CONCURRENCY = int(os.getenv("CAMPAIGN_CONCURRENCY", "2"))
+# Largest single image accepted from a campaign zip (guards against zip bombs)
+CAMPAIGN_MAX_ASSET_MB = int(os.getenv("CAMPAIGN_MAX_ASSET_MB", "50"))
+
+# Manifest columns naming zip members; mirrors the /generate-images upload fields
+PRODUCT_KEYS = ("product_image", "product_image_2", "product_image_3")
+LOGO_KEY = "logo_image"
+
+
+class CampaignAssets:
+    """
+    Packshots/logos in an uploaded zip, read member by member when a row needs them.
+    Only the zip's directory is held in memory; images are read (not decoded; workers decode)
+    per row. Members can be referenced by full path or, if unambiguous, by file name.
+    """
+
+    def __init__(self, fileobj):
+        self._zip = zipfile.ZipFile(fileobj)
+        self._lock = threading.Lock()
+        self._by_path = {}
+        by_name = {}
+        for info in self._zip.infolist():
+            if info.is_dir():
+                continue
+            self._by_path[info.filename] = info
+            by_name.setdefault(posixpath.basename(info.filename), []).append(info)
+        self._by_name = {name: infos[0] for name, infos in by_name.items() if len(infos) == 1}
+
+    def read(self, name):
+        info = self._by_path.get(name) or self._by_name.get(posixpath.basename(name))
+        if info is None:
+            raise KeyError(f"'{name}' not found in assets zip")
+        if info.file_size > CAMPAIGN_MAX_ASSET_MB * 1024 * 1024:
+            raise ValueError(f"'{name}' is larger than {CAMPAIGN_MAX_ASSET_MB}MB")
+        with self._lock:
+            return self._zip.read(info)
+
+    def close(self):
+        self._zip.close()
+
+
+def row_inputs(spec, assets):
+    """
+    Splits a manifest row into (render spec, product bytes, logo bytes).
+    Raises KeyError/ValueError when the row's image references are missing or unreadable.
+    """
+    spec = dict(spec)
+    names = [spec.pop(key) for key in PRODUCT_KEYS if spec.get(key)]
+    logo_name = spec.pop(LOGO_KEY, None)
+    for key in PRODUCT_KEYS:
+        spec.pop(key, None)
+    if not names:
+        raise ValueError("Row has no product_image")
+    if not logo_name:
+        raise ValueError("Row has no logo_image")
+    return spec, [assets.read(name) for name in names], assets.read(logo_name)
@@ -0,0 +1,113 @@
+import re
+from collections import deque
+
+from compliance_rules import FORBIDDEN_TERMS, PRICE_PATTERNS, ERROR_CODES
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+class TermAutomaton:
+    """
+    Aho-Corasick automaton over a fixed set of terms: finds every occurrence of every term
+    in one left-to-right pass, however many terms there are.
+    """
+
+    def __init__(self, terms):
+        """`terms` is an iterable of (term, payload); payloads are returned with each match."""
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for term, payload in terms:
+            state = 0
+            for ch in term:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(term), payload))
+
+        # Breadth-first failure links; each state also reports the matches of its failure chain
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def finditer(self, text):
+        """Yields (start, end, payload) for every occurrence, including overlapping ones."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in out[state]:
+                yield i + 1 - length, i + 1, payload
+
+
+class ComplianceEngine:
+    """
+    The FORBIDDEN_TERMS and PRICE_PATTERNS tables compiled once: terms into a TermAutomaton,
+    price patterns into a single alternation regex. Terms must start at a word boundary ("ale"
+    doesn't fire inside "sale") but may run on into a longer word, so inflected forms ("prizes",
+    "refundable", "winners") still count. Every hit carries its category, error code and span.
+    """
+
+    def __init__(self, forbidden_terms, price_patterns):
+        self.automaton = TermAutomaton(
+            (term.lower(), (category, term))
+            for category, terms in forbidden_terms.items()
+            for term in terms
+        )
+        self.price_patterns = list(price_patterns)
+        self.price_regex = re.compile(
+            "|".join(f"(?P<p{i}>{pattern})" for i, pattern in enumerate(self.price_patterns))
+        )
+
+    @staticmethod
+    def _bounded(text, start):
+        # Only the leading side is checked, and only when the term itself starts with a word character
+        return not (_is_word_char(text[start]) and start > 0 and _is_word_char(text[start - 1]))
+
+    def scan(self, text):
+        """
+        Every forbidden-term and price hit in `text` (matched case-insensitively), in text order:
+        [{"category", "term", "code", "start", "end"}]. Price hits have category "price" and
+        the matching PRICE_PATTERNS entry as "term".
+        """
+        lowered = text.lower()
+        hits = []
+        for start, end, (category, term) in self.automaton.finditer(lowered):
+            if self._bounded(lowered, start):
+                hits.append({
+                    "category": category,
+                    "term": term,
+                    "code": ERROR_CODES["FORBIDDEN_TERM"],
+                    "start": start,
+                    "end": end,
+                })
+        for m in self.price_regex.finditer(lowered):
+            hits.append({
+                "category": "price",
+                "term": self.price_patterns[int(m.lastgroup[1:])],
+                "code": ERROR_CODES["FORBIDDEN_TERM"],
+                "start": m.start(),
+                "end": m.end(),
+            })
+        hits.sort(key=lambda h: (h["start"], h["end"]))
+        return hits
+
+
+compliance_engine = ComplianceEngine(FORBIDDEN_TERMS, PRICE_PATTERNS)
@@ -2,6 +2,9 @@ import os
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps, ImageColor
 import random
 import math
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
 from background_removal import remove_bg
 from compliance_rules import SAFE_ZONES, FONT_CONSTRAINTS, DESIGN_RULES, ALCOHOL_RULES, ALCOHOL_KEYWORDS, LEP_TEMPLATE_RULES, PLATFORM_RULES
 
@@ -9,13 +12,75 @@ from compliance_rules import SAFE_ZONES, FONT_CONSTRAINTS, DESIGN_RULES, ALCOHOL
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FONTS_DIR = os.path.join(BASE_DIR, "assets", "fonts")
 
-def load_font(font_name, size):
+FONT_CACHE_SIZE = int(os.getenv("FONT_CACHE_SIZE", "64"))
+
+# Font fallback counters (loads/hits come from the lru_cache itself). A non-zero "fallbacks" means
+# some text is rendering in Pillow's tiny default bitmap font because a .ttf is missing from FONTS_DIR.
+# Formats may render on parallel threads (RENDER_PARALLEL_FORMATS), so updates take the lock.
+FONT_METRICS = {"fallbacks": 0, "missing": set()}
+_font_metrics_lock = threading.Lock()
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def _load_font_file(font_name, size):
     path = os.path.join(FONTS_DIR, font_name)
     try:
         return ImageFont.truetype(path, size)
     except OSError:
+        with _font_metrics_lock:
+            first = font_name not in FONT_METRICS["missing"]
+            FONT_METRICS["missing"].add(font_name)
+        if first:
+            print(f"Warning: font '{font_name}' not found in {FONTS_DIR}, using default font")
         return ImageFont.load_default()
 
+def load_font(font_name, size):
+    """Memoized by (font file, size); fonts are read-only once loaded so sharing is safe."""
+    font = _load_font_file(font_name, int(size))
+    if font_name in FONT_METRICS["missing"]:
+        with _font_metrics_lock:
+            FONT_METRICS["fallbacks"] += 1
+    return font
+
+def font_stats():
+    info = _load_font_file.cache_info()
+    with _font_metrics_lock:
+        fallbacks = FONT_METRICS["fallbacks"]
+        missing = sorted(FONT_METRICS["missing"])
+    return {
+        "loads": info.misses,
+        "hits": info.hits,
+        "fallbacks": fallbacks,
+        "missing": missing,
+        "cached": info.currsize,
+        "max_cached": info.maxsize,
+    }
+
+def format_font_sizes(W, H):
+    """
+    (font file, size) pairs compose_creative requests for a W x H canvas.
+    Mirrors the sizing rules below; CTA/Clubcard sizes are the unscaled defaults.
+    """
+    alcohol_h = max(ALCOHOL_RULES.get("lockup_min_height", 20), int(H * 0.08))
+    cta_fs = max(14, int(H * 0.02))
+    cc_h = int(int(W * 0.26) * 0.75)
+    return [
+        ("PlayfairDisplay-Bold.ttf", int(H * 0.045)),
+        ("Montserrat-SemiBold.ttf", int(H * 0.025)),
+        ("Montserrat-Regular.ttf", max(16, int(H * 0.025))),
+        ("Montserrat-Regular.ttf", max(14, int(H * 0.018))),
+        ("Montserrat-Bold.ttf", int(alcohol_h * 0.45)),
+        ("Montserrat-Bold.ttf", cta_fs),
+        ("Montserrat-Bold.ttf", int(int(cta_fs * 2.5) * 0.4)),
+        ("Montserrat-Bold.ttf", int(cc_h * 0.18)),
+        ("Montserrat-Bold.ttf", int(cc_h * 0.42)),
+    ]
+
+def preload_fonts(formats):
+    """Warms the font cache for every canvas size in `formats` ({name: (W, H)})."""
+    for W, H in formats.values():
+        for font_name, size in format_font_sizes(W, H):
+            _load_font_file(font_name, size)
+
 def add_shadow(img, offset=(0, 10), blur_radius=15, shadow_color=(0, 0, 0, 80)):
     """Simple aesthetic shadow for floating objects."""
     w, h = img.size
@@ -30,14 +95,14 @@ def add_shadow(img, offset=(0, 10), blur_radius=15, shadow_color=(0, 0, 0, 80)):
     
     return shadow_layer, padding//2
 
-def create_product_group(products, gap=15):
+def create_product_group(products, gap=15, already_cut=False):
     """
     Merges multiple product images into a single linear group.
-    - Removes background for each.
+    - Removes background for each (skipped if `already_cut`).
     - Resizes to common safe height.
     - Concatenates with spacing.
     """
-    cleaned_products = [remove_bg(p) for p in products]
+    cleaned_products = list(products) if already_cut else [remove_bg(p) for p in products]
     if not cleaned_products:
         return None
         
@@ -67,14 +132,119 @@ def create_product_group(products, gap=15):
         
     return group_img
 
-def compose_creative(bg, products, logo, spec, fmt):
+def resize_logo(logo, W):
+    """Scales the logo to 15% of the canvas width (top-center lockup)."""
+    logo_target_w = int(W * 0.15)
+    scale_l = logo_target_w / max(1, logo.width)
+    logo_h = int(logo.height * scale_l)
+    return logo.resize((logo_target_w, logo_h), Image.Resampling.LANCZOS)
+
+@dataclass(frozen=True)
+class PreparedAssets:
+    """
+    Request-scoped, read-only inputs shared by every format and colour variant.
+    Built once by prepare_assets() so cutout/resize/concat work doesn't repeat per render.
+    """
+    cutouts: tuple
+    group: Image.Image
+    logo: Image.Image
+    logos: dict = field(default_factory=dict) # canvas width -> resized logo
+
+    def logo_for_width(self, W):
+        resized = self.logos.get(W)
+        if resized is None:
+            resized = resize_logo(self.logo, W)
+        return resized
+
+def prepare_assets(products, logo, widths=()):
+    """
+    Preparation stage: background removal, product grouping and logo scaling, done once per request.
+    `widths` are the canvas widths to pre-scale the logo for (e.g. from FORMATS).
+    """
+    if isinstance(products, Image.Image):
+        products = [products]
+
+    cutouts = tuple(remove_bg(p) for p in products)
+    group = create_product_group(cutouts, already_cut=True)
+    logos = {W: resize_logo(logo, W) for W in set(widths)}
+    return PreparedAssets(cutouts=cutouts, group=group, logo=logo, logos=logos)
+
+@dataclass(frozen=True)
+class ForegroundLayer:
+    """
+    Background-independent part of a creative: a transparent RGBA layer with text, logo,
+    product and sidekick, plus what has to be re-evaluated for each background.
+    """
+    layer: Image.Image
+    background_override: object = None # LEP forces its own background colour
+    lockup: tuple = None # Drinkaware (y, height); its colour depends on the background
+
+def _composite(layer, im, pos):
+    """alpha_composite `im` onto `layer` at `pos`, clipping anything left of / above the canvas."""
+    x, y = pos
+    if x < 0 or y < 0:
+        im = im.crop((max(0, -x), max(0, -y), im.width, im.height))
+        x, y = max(0, x), max(0, y)
+    layer.alpha_composite(im, (x, y))
+
+def compose_creative(bg, products, logo, spec, fmt, prepared=None):
     """
     Strict Tesco-Compliant Composer.
     Supports Single or Multi-Packshots (up to 3).
+    Pass `prepared` (see prepare_assets) to reuse the product group and scaled logo across renders.
+    """
+    fg = compose_foreground(bg.size, products, logo, spec, fmt, prepared=prepared)
+    return apply_background(fg, bg)
+
+def apply_background(fg, bg):
     """
-    W, H = bg.size
-    canvas = bg.copy()
+    Places a ForegroundLayer over a background. Only the contrast-dependent
+    pieces are drawn here, so one foreground can be reused for many colours.
+    """
+    if fg.background_override is not None:
+        canvas = Image.new("RGBA", bg.size, fg.background_override)
+    else:
+        canvas = bg.copy()
+    W, H = canvas.size
     draw = ImageDraw.Draw(canvas)
+
+    # Drinkaware lockup (sits below every foreground element)
+    if fg.lockup is not None:
+        lockup_y, alcohol_h = fg.lockup
+
+        # Contrast Check
+        try:
+            region = canvas.crop((0, int(lockup_y), int(W), int(lockup_y + alcohol_h)))
+            avg_color = region.resize((1, 1)).getpixel((0, 0))
+            if len(avg_color) >= 3:
+                brightness = sum(avg_color[:3]) / 3
+            else:
+                brightness = 255
+            dw_color = "white" if brightness < 128 else "black"
+        except Exception:
+            dw_color = "black"
+
+        # Line
+        draw.line([(W*0.05, lockup_y), (W*0.95, lockup_y)], fill=dw_color, width=2)
+        # Text
+        font_dw = load_font("Montserrat-Bold.ttf", int(alcohol_h * 0.45))
+        draw.text((W//2, lockup_y + alcohol_h//2), "drinkaware.co.uk", anchor="mm", fill=dw_color, font=font_dw)
+
+    mode = canvas.mode
+    canvas = canvas.convert("RGBA")
+    canvas.alpha_composite(fg.layer)
+    return canvas if mode == "RGBA" else canvas.convert(mode)
+
+def compose_foreground(size, products, logo, spec, fmt, prepared=None):
+    """
+    Lays out and renders everything except the background on a transparent W x H layer.
+    Raises ValueError on compliance/layout violations, like compose_creative.
+    """
+    W, H = size
+    canvas = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(canvas, "RGBA")
+    background_override = None
+    lockup = None
     
     # Input normalization
     if isinstance(products, Image.Image):
@@ -89,8 +259,7 @@ def compose_creative(bg, products, logo, spec, fmt):
     
     # Colors
     if is_LEP:
-        canvas = Image.new("RGBA", (W, H), LEP_TEMPLATE_RULES["background_color"])
-        draw = ImageDraw.Draw(canvas)
+        background_override = LEP_TEMPLATE_RULES["background_color"]
         text_color = LEP_TEMPLATE_RULES["font_color"]
     else:
         text_color = (30, 30, 40) # Standard Dark
@@ -124,23 +293,8 @@ def compose_creative(bg, products, logo, spec, fmt):
         lockup_y = current_bottom_y - alcohol_h
         current_bottom_y = lockup_y - 20 
 
-        # Contrast Check
-        try:
-            region = canvas.crop((0, int(lockup_y), int(W), int(lockup_y + alcohol_h)))
-            avg_color = region.resize((1, 1)).getpixel((0, 0))
-            if len(avg_color) >= 3:
-                brightness = sum(avg_color[:3]) / 3
-            else:
-                brightness = 255
-            dw_color = "white" if brightness < 128 else "black"
-        except Exception:
-            dw_color = "black"
-
-        # Line
-        draw.line([(W*0.05, lockup_y), (W*0.95, lockup_y)], fill=dw_color, width=2)
-        # Text
-        font_dw = load_font("Montserrat-Bold.ttf", int(alcohol_h * 0.45))
-        draw.text((W//2, lockup_y + alcohol_h//2), "drinkaware.co.uk", anchor="mm", fill=dw_color, font=font_dw)
+        # Line, text and their contrast colour are drawn per background (see apply_background)
+        lockup = (lockup_y, alcohol_h)
 
     # B. Tesco Tag
     tesco_tag = spec.get("tesco_tag")
@@ -180,15 +334,16 @@ def compose_creative(bg, products, logo, spec, fmt):
     # Logo -> Headline -> Subhead
 
     # A. Logo (Top Center)
-    logo_target_w = int(W * 0.15)
-    scale_l = logo_target_w / max(1, logo.width)
-    logo_h = int(logo.height * scale_l)
-    logo_resized = logo.resize((logo_target_w, logo_h), Image.Resampling.LANCZOS)
+    if prepared is not None:
+        logo_resized = prepared.logo_for_width(W)
+    else:
+        logo_resized = resize_logo(logo, W)
+    logo_target_w, logo_h = logo_resized.size
     
     logo_x = (W - logo_target_w) // 2
     logo_y = current_top_y + 10
     
-    canvas.paste(logo_resized, (logo_x, logo_y), logo_resized)
+    _composite(canvas, logo_resized, (logo_x, logo_y))
     current_top_y = logo_y + logo_h + 30 
 
     # B. Headline
@@ -211,7 +366,10 @@ def compose_creative(bg, products, logo, spec, fmt):
 
     # --- 5. CENTER CONTENT (Strict Product Centering + Sidekick) ---
     # Create the Combined Product Group FIRST
-    product = create_product_group(products)
+    if prepared is not None:
+        product = prepared.group
+    else:
+        product = create_product_group(products)
 
     # Strategy: Product is ALWAYS visual center. Sidekick hangs to the right.
     # If Sidekick hits edge, we scale down the Product to make room, but KEEP Product centered.
@@ -297,8 +455,8 @@ def compose_creative(bg, products, logo, spec, fmt):
     
     # F. Render Product
     prod_shadow, shadow_offset = add_shadow(product_resized, blur_radius=25, offset=(0, 20))
-    canvas.paste(prod_shadow, (px - shadow_offset, py - shadow_offset), prod_shadow)
-    canvas.paste(product_resized, (px, py), product_resized)
+    _composite(canvas, prod_shadow, (px - shadow_offset, py - shadow_offset))
+    _composite(canvas, product_resized, (px, py))
     
     # G. Render Sidekick (Right Side)
     if side_element:
@@ -322,8 +480,8 @@ def compose_creative(bg, products, logo, spec, fmt):
              cc_yellow = "#FFDD00"
              cc_blue = "#00539F"
              
-             # Shadow
-             draw.rectangle([cc_x+5, cc_y+5, cc_x+cc_w+5, cc_y+cc_h+5], fill="rgba(0,0,0,50)")
+             # Shadow (opaque: this was always drawn on an RGB canvas, which discarded the 50 alpha)
+             draw.rectangle([cc_x+5, cc_y+5, cc_x+cc_w+5, cc_y+cc_h+5], fill=(0, 0, 0))
              draw.rectangle([cc_x, cc_y, cc_x+cc_w, cc_y+cc_h], fill=cc_yellow)
              
              f_ccl = load_font("Montserrat-Bold.ttf", int(cc_h * 0.18))
@@ -333,4 +491,4 @@ def compose_creative(bg, products, logo, spec, fmt):
              f_ccp = load_font("Montserrat-Bold.ttf", int(cc_h * 0.42))
              draw.text((cc_x + cc_w//2, cc_y + cc_h//2 + 5), price, anchor="mm", fill=cc_blue, font=f_ccp)
 
-    return canvas
+    return ForegroundLayer(layer=canvas, background_override=background_override, lockup=lockup)
@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# --- CONFIG ---
+# Memory tier is bounded by decoded pixel bytes (a 4000x3000 RGBA cutout is ~48MB).
+CUTOUT_CACHE_MAX_MB = int(os.getenv("CUTOUT_CACHE_MAX_MB", "256"))
+# Disk tier is optional: leave CUTOUT_CACHE_DIR unset to keep the cache in memory only.
+CUTOUT_CACHE_DIR = os.getenv("CUTOUT_CACHE_DIR")
+CUTOUT_CACHE_DISK_MAX_MB = int(os.getenv("CUTOUT_CACHE_DISK_MAX_MB", "1024"))
+
+
+class CutoutCache:
+    """
+    Two-tier cache for background-removed cutouts.
+    - Memory: LRU bounded by total pixel bytes.
+    - Disk (optional): PNG per key, oldest-accessed files evicted once the directory exceeds its size budget.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    # ---------------- MEMORY TIER ----------------
+    def _remember(self, key, img):
+        size = len(img.getbands()) * img.width * img.height
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return
+            self._items[key] = (img, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, (_, old_size) = self._items.popitem(last=False)
+                self._bytes -= old_size
+
+    # ---------------- DISK TIER ----------------
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.png")
+
+    def _disk_get(self, key):
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as f:
+                img = f.convert("RGBA")
+            os.utime(path)  # Mark as recently used for eviction
+            return img
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key, img):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            img.save(tmp_path, format="PNG")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Cutout cache disk write failed: {e}")
+            return
+        self._disk_evict()
+
+    def _disk_evict(self):
+        try:
+            entries = []
+            total = 0
+            for name in os.listdir(self.disk_dir):
+                if not name.endswith(".png"):
+                    continue
+                st = os.stat(os.path.join(self.disk_dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+                total += st.st_size
+            if total <= self.disk_max_bytes:
+                return
+            for _, size, name in sorted(entries):
+                os.remove(os.path.join(self.disk_dir, name))
+                total -= size
+                if total <= self.disk_max_bytes:
+                    break
+        except OSError as e:
+            print(f"Cutout cache eviction failed: {e}")
+
+    # ---------------- PUBLIC ----------------
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy()
+
+        if self.disk_dir:
+            img = self._disk_get(key)
+            if img is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, img)
+                return img.copy()
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, img):
+        img = img.copy()
+        self._remember(key, img)
+        if self.disk_dir:
+            self._disk_put(key, img)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {
+            "items": len(self._items),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+        }
+
+
+cutout_cache = CutoutCache(
+    max_bytes=CUTOUT_CACHE_MAX_MB * 1024 * 1024,
+    disk_dir=CUTOUT_CACHE_DIR,
+    disk_max_bytes=CUTOUT_CACHE_DISK_MAX_MB * 1024 * 1024,
+)
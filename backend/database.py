@@ -5,5 +5,37 @@ from dotenv import load_dotenv
 load_dotenv()
 
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
-client = AsyncIOMotorClient(MONGO_URL)
+client = AsyncIOMotorClient(MONGO_URL, tz_aware=True) # created_at etc. come back as UTC-aware datetimes
 db = client.retail_app
+
+
+async def ensure_indexes():
+    try:
+        # One cloud image record per user per identical creative (legacy records have no content_hash)
+        await db.images.create_index(
+            [("user_id", 1), ("content_hash", 1)],
+            unique=True,
+            partialFilterExpression={"content_hash": {"$exists": True}},
+        )
+        # Keyset pagination for /cloud-images (newest first)
+        await db.images.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        # Batch downloads (batch_ids lists every batch a deduplicated creative was produced in)
+        await db.images.create_index([("user_id", 1), ("batch_id", 1)])
+        await db.images.create_index([("user_id", 1), ("batch_ids", 1)])
+    except Exception as e:
+        print(f"Warning: could not create indexes: {e}")
+
+    try:
+        # Legacy records stored a uuid1 string as created_at; give them a real date (their ObjectId's) so they sort and page
+        await db.images.update_many(
+            {"created_at": {"$not": {"$type": "date"}}},
+            [{"$set": {"created_at": {"$toDate": "$_id"}}}],
+        )
+    except Exception as e:
+        print(f"Warning: could not backfill image created_at dates: {e}")
+
+    try:
+        # ref_count was renamed: it counts renders, it never tracked references
+        await db.images.update_many({"ref_count": {"$exists": True}}, {"$rename": {"ref_count": "render_count"}})
+    except Exception as e:
+        print(f"Warning: could not rename image ref_count: {e}")
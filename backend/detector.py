@@ -0,0 +1,123 @@
+import os
+import threading
+import cv2
+import numpy as np
+
+# --- CONFIG ---
+# Bottle detection runs on a working copy no larger than this on its longest side. Packshots are
+# often 12MP+; a bottle silhouette is still obvious at ~1MP and contour cost scales with pixels.
+DETECTOR_MAX_DIM = int(os.getenv("DETECTOR_MAX_DIM", "1024"))
+# Same for face detection; 0 (default) keeps full resolution. The Haar cascade needs the full
+# FACE_MIN_SIZE (40px) to find small faces, so any downscale lets small faces in large photos pass.
+DETECTOR_FACE_MAX_DIM = int(os.getenv("DETECTOR_FACE_MAX_DIM", "0"))
+
+# Reference parameters, expressed at full resolution
+FACE_MIN_SIZE = 40
+BOTTLE_DILATE_KERNEL = 5
+
+_face_cascade = None
+_load_lock = threading.Lock()
+_detect_lock = threading.Lock() # CascadeClassifier isn't safe to share across threads
+
+
+def face_cascade():
+    """The Haar face cascade, loaded from XML once per process."""
+    global _face_cascade
+    if _face_cascade is None:
+        with _load_lock:
+            if _face_cascade is None:
+                _face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    return _face_cascade
+
+
+def _fit(gray, max_dim):
+    """(gray resized to at most `max_dim` on its longest side, scale); max_dim 0 keeps it as is."""
+    h, w = gray.shape[:2]
+    scale = min(1.0, max_dim / max(w, h)) if max_dim else 1.0
+    if scale < 1.0:
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+class WorkingImage:
+    """
+    Grayscale copies of an image shared by every detector: `gray` downscaled to max_dim for
+    bottle detection, `face_gray` to face_max_dim (full resolution by default) for faces.
+    Scales map working coordinates back to the original (original = working / scale).
+    """
+
+    def __init__(self, img_bgr, max_dim=None, face_max_dim=None):
+        max_dim = max_dim or DETECTOR_MAX_DIM
+        face_max_dim = DETECTOR_FACE_MAX_DIM if face_max_dim is None else face_max_dim
+        h, w = img_bgr.shape[:2]
+        self.original_size = (w, h)
+        # Grayscale first: resizing one channel is cheaper than three
+        gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+        self.gray, self.scale = _fit(gray, max_dim)
+        self.face_gray, self.face_scale = _fit(gray, face_max_dim)
+
+    def to_original(self, box, scale=None):
+        scale = scale or self.scale
+        return [int(round(v / scale)) for v in box]
+
+
+def detect_faces(work):
+    """Face boxes ([x, y, w, h], original coordinates) found by the Haar cascade."""
+    # The cascade's own window is 24px, so there's no point asking for smaller
+    min_size = max(24, round(FACE_MIN_SIZE * work.face_scale))
+    cascade = face_cascade()
+    with _detect_lock:
+        # Higher threshold to reduce false positives (Set to 10 for strictness as requested)
+        faces = cascade.detectMultiScale(work.face_gray, scaleFactor=1.2, minNeighbors=10, minSize=(min_size, min_size))
+    return [work.to_original(box, work.face_scale) for box in faces]
+
+
+def find_bottle(work):
+    """
+    Heuristic bottle detection using contour analysis.
+    Returns the [x, y, w, h] box (original coordinates) of the first bottle-like contour, or None.
+    """
+    h, w = work.gray.shape
+    img_area = h * w
+
+    # 1. Edge Detection (Canny)
+    edges = cv2.Canny(work.gray, 50, 150)
+
+    # Dilation to close gaps; kernel scaled with the image so gaps close the same at any size
+    k = max(3, round(BOTTLE_DILATE_KERNEL * work.scale) | 1)
+    dilated = cv2.dilate(edges, np.ones((k, k), np.uint8), iterations=2)
+
+    contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    for cnt in contours:
+        area = cv2.contourArea(cnt)
+
+        # Filter noise (0.5% area) and full-screen backgrounds (>90% area)
+        if area < (img_area * 0.005) or area > (img_area * 0.9):
+            continue
+
+        x, y, bw, bh = cv2.boundingRect(cnt)
+        aspect_ratio = float(bh) / bw
+
+        # Bottles are vertically oriented.
+        # Range 1.5 (stout) to 6.5 (tall)
+        if 1.5 < aspect_ratio < 6.5:
+            # Bottles have necks, so they fill less of their bounding rect than a box.
+            # 0.4 - 0.85 allows for various bottle shapes.
+            extent = float(area) / (bw * bh)
+            if 0.4 < extent < 0.85:
+                return work.to_original((x, y, bw, bh))
+
+    return None
+
+
+def analyze(img_bgr, max_dim=None, face_max_dim=None):
+    """
+    People then alcohol detection on shared grayscale working copies.
+    Returns {"faces": [...], "bottle": box or None}; bottles aren't looked for once a face is found.
+    """
+    work = WorkingImage(img_bgr, max_dim, face_max_dim)
+    faces = detect_faces(work)
+    bottle = None if faces else find_bottle(work)
+    return {"faces": faces, "bottle": bottle}
@@ -1,36 +1,108 @@
 import base64
 import io
 import os
+import threading
+
+JPEG_MAX_QUALITY = 95
+JPEG_MIN_QUALITY = 15
+
+# Last quality that fit the size budget, per (canvas size, budget). Creatives of the same
+# format compress similarly, so this is usually the answer and the search confirms it in 1-2 encodes.
+_quality_seeds = {}
+_seeds_lock = threading.Lock()
+_MAX_SEEDS = 256
+
+def _encode(img, format, **params):
+    buf = io.BytesIO()
+    img.save(buf, format=format, **params)
+    return buf.getvalue()
+
+def encode_jpeg_to_size(img, max_size_kb=500):
+    """
+    Highest JPEG quality in [JPEG_MIN_QUALITY, JPEG_MAX_QUALITY] whose output is under max_size_kb,
+    found by binary search seeded with the last good quality for this canvas size.
+    Returns (bytes, quality, encodes). If nothing fits, returns the minimum-quality encode.
+    """
+    # JPEG doesn't support transparency, convert once up front
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    limit = max_size_kb * 1024
+    key = (img.size, max_size_kb)
+    with _seeds_lock:
+        seed = _quality_seeds.get(key, JPEG_MAX_QUALITY)
+
+    lo, hi = JPEG_MIN_QUALITY, JPEG_MAX_QUALITY
+    best = None # (quality, data) of the highest quality known to fit
+    smallest = None # lowest-quality encode seen, returned if nothing fits
+    encodes = 0
+    q = seed
+
+    while lo <= hi:
+        data = _encode(img, "JPEG", quality=q, optimize=True)
+        encodes += 1
+        if smallest is None or q < smallest[0]:
+            smallest = (q, data)
+
+        if len(data) < limit:
+            best = (q, data)
+            lo = q + 1
+        else:
+            hi = q - 1
+
+        # After the seed, try its neighbour first: on a repeat format the answer is usually the seed itself
+        if encodes == 1 and best is not None and q < JPEG_MAX_QUALITY:
+            q = q + 1
+        elif encodes == 1 and best is None and q > JPEG_MIN_QUALITY:
+            q = q - 1
+        else:
+            q = (lo + hi) // 2
+
+    if best is None:
+        if smallest[0] != JPEG_MIN_QUALITY:
+            smallest = (JPEG_MIN_QUALITY, _encode(img, "JPEG", quality=JPEG_MIN_QUALITY, optimize=True))
+            encodes += 1
+        return smallest[1], smallest[0], encodes
+
+    with _seeds_lock:
+        if len(_quality_seeds) >= _MAX_SEEDS:
+            _quality_seeds.clear()
+        _quality_seeds[key] = best[0]
+    return best[1], best[0], encodes
+
+def encode_image(img, format="PNG", max_size_kb=500):
+    """
+    Encodes to raw bytes and reports what was produced:
+    {"data": bytes, "format", "size_kb", "quality" (JPEG only), "encodes"}.
+    """
+    format = format.upper()
+    if format not in ["PNG", "JPEG", "JPG"]:
+        format = "PNG"
+
+    if format in ["JPEG", "JPG"]:
+        data, quality, encodes = encode_jpeg_to_size(img, max_size_kb=max_size_kb)
+        format = "JPEG"
+    else:
+        # Pillow's PNG optimize flag doesn't use a quality param; size is accepted as-is
+        data = _encode(img, "PNG", optimize=True)
+        quality, encodes = None, 1
+
+    return {
+        "data": data,
+        "format": format,
+        "size_kb": round(len(data) / 1024, 1),
+        "quality": quality,
+        "encodes": encodes,
+    }
+
+def export_image_info(img, format="PNG", max_size_kb=500):
+    """Like export_image, but returns encode_image's report with "data" as base64."""
+    info = encode_image(img, format=format, max_size_kb=max_size_kb)
+    info["data"] = base64.b64encode(info["data"]).decode()
+    return info
 
 def export_image(img, format="PNG", max_size_kb=500):
     """
     Exports image to base64, optimizing quality to ensure it is under max_size_kb.
     """
-    quality = 95
-    step = 5
-    
-    if format.upper() not in ["PNG", "JPEG", "JPG"]:
-        format = "PNG"
-        
-    while quality > 10:
-        buf = io.BytesIO()
-        if format.upper() in ["JPEG", "JPG"]:
-             # JPEG doesn't support transparency, convert if needed
-             if img.mode == 'RGBA':
-                 img = img.convert('RGB')
-             img.save(buf, format=format, quality=quality, optimize=True)
-        else:
-             # PNG optimization
-             # Pillow's PNG optimize flag doesn't use quality param effectively for size reduction like JPEG
-             # But we can try to rely on optimize=True or resizing if absolutely needed (omitted for now to keep it simple)
-             img.save(buf, format=format, optimize=True)
-             
-        size_kb = buf.tell() / 1024
-        
-        if size_kb < max_size_kb or format.upper() == "PNG": 
-            # PNG quality adjustment is harder with standard PIL, accept it or switch to JPEG if strict
-            break
-            
-        quality -= step
-        
-    return base64.b64encode(buf.getvalue()).decode()
+    return export_image_info(img, format=format, max_size_kb=max_size_kb)["data"]
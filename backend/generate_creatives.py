@@ -1,25 +1,87 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from formats import FORMATS
 from background_generator import generate_background
-from composer import compose_creative
-from exporter import export_image
+from composer import compose_creative, compose_foreground, apply_background, prepare_assets
+from exporter import export_image, encode_image
 from validator import validate_text_content, validate_image_content, validate_spec
 
-def generate_all(spec, products, logo):
-    outputs = {}
+# --- CONFIG ---
+# Opt-in: render the formats of one request concurrently on a thread pool.
+RENDER_PARALLEL_FORMATS = os.getenv("RENDER_PARALLEL_FORMATS", "0") == "1"
+RENDER_FORMAT_THREADS = int(os.getenv("RENDER_FORMAT_THREADS", str(len(FORMATS))))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _format_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=RENDER_FORMAT_THREADS, thread_name_prefix="render-format")
+        return _executor
+
+def foreground_key(fmt, spec):
+    """Everything but the background colour determines a format's foreground layer."""
+    layout_spec = {k: v for k, v in spec.items() if k != "background_color"}
+    return fmt, json.dumps(layout_spec, sort_keys=True, default=str)
+
+def render_format(fmt, W, H, spec, products, logo, prepared, foregrounds=None, raw=False):
+    """
+    Compose + PNG/JPEG export for one format. Composition failures are isolated to that format.
+    `foregrounds` is an optional dict shared across colour variants: the transparent foreground
+    is rendered once per format and only re-composited over each new background.
+    `raw` returns encoded bytes instead of base64 strings.
+    """
+    bg = generate_background("clean", W, H, custom_color=spec.get("background_color"))
     
-    # Legacy support
-    if not isinstance(products, list):
-        products = [products]
+    try:
+        if foregrounds is None:
+            # Pass list of products to composer
+            img = compose_creative(bg, products, logo, spec, fmt, prepared=prepared)
+        else:
+            key = foreground_key(fmt, spec)
+            fg = foregrounds.get(key)
+            if fg is None:
+                fg = compose_foreground((W, H), products, logo, spec, fmt, prepared=prepared)
+                foregrounds[key] = fg
+            img = apply_background(fg, bg)
+        
+        # Requirement: Enable download in final Jpeg and Png.
+        # We generate both
+        if raw:
+            return {
+                "png": encode_image(img, format="PNG")["data"],
+                "jpg": encode_image(img, format="JPEG", max_size_kb=500)["data"],
+            }
+
+        png_b64 = export_image(img, format="PNG")
+        jpg_b64 = export_image(img, format="JPEG", max_size_kb=500)
+        
+        return {
+            "png": png_b64,
+            "jpg": jpg_b64
+        }
+    except ValueError as e:
+        # Handle specific composition failures (e.g. Mandatory Tag missing)
+        # We return a simple error object or just skip this format
+        print(f"Skipping format {fmt} due to error: {e}")
+        return {"error": str(e)}
 
+def validate_request(spec, products):
+    """
+    Spec, text and image compliance checks run before any rendering.
+    Returns the validation dict; may set spec["is_alcohol"] when the user confirmed Drinkaware compliance.
+    """
     # 0. Spec Validation (Fail Fast)
     spec_errors = validate_spec(spec)
     if spec_errors:
         return {
-            "validation": {
-                "valid": False, 
-                "errors": spec_errors, 
-                "warnings": []
-            }
+            "valid": False, 
+            "errors": spec_errors, 
+            "warnings": []
         }
 
     # 1. Text Validation
@@ -53,32 +115,46 @@ def generate_all(spec, products, logo):
                     # User confirmed compliance, force alcohol mode in composer
                     spec["is_alcohol"] = True
 
-    outputs["validation"] = validation
+    return validation
+
+def generate_all(spec, products, logo, prepared=None, parallel=None, foregrounds=None, raw=False):
+    """
+    Validates the spec/images and renders every format in FORMATS.
+    `prepared` (from composer.prepare_assets) lets callers rendering several colour
+    variants of the same upload share one preparation stage.
+    `parallel` overrides RENDER_PARALLEL_FORMATS for this call.
+    `foregrounds` (a dict, initially empty) caches per-format foreground layers across colour variants.
+    `raw` returns encoded bytes instead of base64 strings.
+    """
+    # Legacy support
+    if not isinstance(products, list):
+        products = [products]
+
+    outputs = {"validation": validate_request(spec, products)}
 
     # Block generation on hard failure
-    if not validation["valid"]:
+    if not outputs["validation"]["valid"]:
         return outputs
+
+    # 3. Preparation Stage (once per request, shared by all formats)
+    if prepared is None:
+        prepared = prepare_assets(products, logo, widths=[W for W, _ in FORMATS.values()])
     
-    for fmt, (W, H) in FORMATS.items():
-        bg = generate_background("clean", W, H, custom_color=spec.get("background_color"))
-        
-        try:
-            # Pass list of products to composer
-            img = compose_creative(bg, products, logo, spec, fmt)
-            
-            # Requirement: Enable download in final Jpeg and Png.
-            # We generate both
-            png_b64 = export_image(img, format="PNG")
-            jpg_b64 = export_image(img, format="JPEG", max_size_kb=500)
-            
-            outputs[fmt] = {
-                "png": png_b64,
-                "jpg": jpg_b64
-            }
-        except ValueError as e:
-            # Handle specific composition failures (e.g. Mandatory Tag missing)
-            # We return a simple error object or just skip this format
-            print(f"Skipping format {fmt} due to error: {e}")
-            outputs[fmt] = {"error": str(e)}
+    if parallel is None:
+        parallel = RENDER_PARALLEL_FORMATS
+
+    if parallel:
+        # Pillow releases the GIL for resize/blur/encode, so formats overlap on multi-core nodes
+        futures = [
+            _format_executor().submit(render_format, fmt, W, H, spec, products, logo, prepared, foregrounds, raw)
+            for fmt, (W, H) in FORMATS.items()
+        ]
+        results = [f.result() for f in futures]
+    else:
+        results = [render_format(fmt, W, H, spec, products, logo, prepared, foregrounds, raw) for fmt, (W, H) in FORMATS.items()]
+
+    # Merged in FORMATS order regardless of completion order
+    for fmt, result in zip(FORMATS, results):
+        outputs[fmt] = result
 
-    return outputs
\ No newline at end of file
+    return outputs
@@ -0,0 +1,15 @@
+import hashlib
+
+
+def content_hash(img, namespace=""):
+    """
+    Stable hash of the decoded pixels (mode + size + raw bytes).
+    Two uploads of the same packshot hash the same even if the files differ in encoding/metadata.
+    `namespace` keeps keys of different caches/methods apart.
+    """
+    h = hashlib.sha256()
+    h.update(namespace.encode())
+    h.update(img.mode.encode())
+    h.update(f"{img.width}x{img.height}".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
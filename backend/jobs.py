@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+import uuid
+
+# --- CONFIG ---
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs are kept this long so clients can still read their final status
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class Job:
+    """
+    A unit of background work split into steps (e.g. one step per colour variant).
+    Completed steps are remembered, so a retry only re-runs the steps that didn't finish.
+    """
+
+    def __init__(self, user_id, kind, steps, handler, payload):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.kind = kind
+        self.steps = list(steps)
+        self.handler = handler
+        self.payload = payload
+        self.status = QUEUED
+        self.completed = []
+        self.results = []
+        self.errors = []
+        self.attempts = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def pending(self):
+        return [s for s in self.steps if s not in self.completed]
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": len(self.steps),
+            "completed": len(self.completed),
+            "results": self.results,
+            "errors": self.errors,
+            "attempts": self.attempts,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class JobQueue:
+    """
+    In-process asyncio job queue. Jobs run independently of the request that created them,
+    so slow or disconnected clients don't affect them. Jobs are lost on process restart.
+    """
+
+    def __init__(self, workers, max_attempts, ttl_seconds):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, user_id, kind, steps, handler, payload):
+        """`handler(job, step)` is awaited once per step and returns that step's result."""
+        self._prune()
+        job = Job(user_id, kind, steps, handler, payload)
+        self.jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def retry(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.status != FAILED:
+            return None
+        job.status = QUEUED
+        job.attempts = 0
+        job.errors = []
+        job.updated_at = time.time()
+        self._queue.put_nowait(job.id)
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [j.id for j in self.jobs.values() if j.status in (DONE, FAILED) and j.updated_at < cutoff]:
+            del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            if job is not None:
+                await self._run(job)
+            self._queue.task_done()
+
+    async def _run(self, job):
+        job.status = RUNNING
+        while job.pending and job.attempts < self.max_attempts:
+            job.attempts += 1
+            for step in job.pending:
+                try:
+                    result = await job.handler(job, step)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Job {job.id} step {step!r} failed (attempt {job.attempts}): {e}")
+                    job.errors.append({"step": step, "attempt": job.attempts, "error": str(e)})
+                    job.updated_at = time.time()
+                    break
+                job.completed.append(step)
+                job.results.append(result)
+                job.updated_at = time.time()
+
+        job.status = DONE if not job.pending else FAILED
+        job.updated_at = time.time()
+        if job.status == DONE:
+            # Inputs are only needed for retries
+            job.payload = None
+
+
+job_queue = JobQueue(JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_TTL_SECONDS)
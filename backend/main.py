@@ -4,21 +4,34 @@ import asyncio
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+# Before the local imports: render_service, render_cache, jobs, storage, ... read their config at import time
+from dotenv import load_dotenv
+load_dotenv()
+
 from fastapi import FastAPI, UploadFile, Form, Depends, HTTPException, status, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordBearer
 from PIL import Image
-import io, json, os, uuid
-import base64
+import io, json, os, uuid, hashlib, base64, zipfile
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from bson import ObjectId
 from typing import Optional, List
 
-from generate_creatives import generate_all
 from ai_agent import generate_ad_image
-from database import db
+from render_service import render_service, RenderUnavailable
+from render_cache import render_cache
+from jobs import job_queue
+from database import db, ensure_indexes
+from storage import storage, LocalStorage
+from batch_validation import detect_format, ndjson_chunks, iter_specs
+from zip_stream import stream_zip
+from campaigns import CampaignAssets, row_inputs, CAMPAIGN_CONCURRENCY
 from models import UserCreate, UserLogin, UserModel, Token
-from auth import verify_password, get_password_hash, create_access_token, get_current_user
-from fastapi import Response
+from auth import verify_password, get_password_hash, create_access_token, get_current_user, invalidate_user
+from fastapi import Response, Request
+from fastapi.responses import StreamingResponse
 
 app = FastAPI()
 
@@ -28,11 +41,35 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# ---------------- STARTUP ----------------
+@app.on_event("startup")
+async def preload_models():
+    # Spawn render workers; each loads the ONNX background-removal model and fonts once
+    await render_service.start()
+    await job_queue.start()
+    asyncio.create_task(ensure_indexes()) # Don't hold up startup if Mongo is slow to answer
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await job_queue.stop()
+    render_service.shutdown()
+
+# ---------------- METRICS ----------------
+@app.get("/metrics")
+async def metrics():
+    return {
+        "render_workers": render_service.workers,
+        "worker": await render_service.stats(),
+        "render_cache": render_cache.stats(),
+    }
+
 # ---------------- STATIC FILES ----------------
-os.makedirs("assets/generated", exist_ok=True)
-app.mount("/static", StaticFiles(directory="assets/generated"), name="static")
+# Only the local backend is served by the API; S3/MinIO URLs point at the bucket directly
+if isinstance(storage, LocalStorage):
+    app.mount("/static", StaticFiles(directory=storage.directory), name="static")
 
 # ---------------- AUTH ROUTES ----------------
 @app.post("/register")
@@ -41,7 +78,7 @@ async def register(user: UserCreate):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_dict = user.dict()
     user_dict["hashed_password"] = hashed_password
     del user_dict["password"]
@@ -53,7 +90,7 @@ async def register(user: UserCreate):
 @app.post("/login", response_model=Token)
 async def login(user: UserLogin):
     db_user = await db.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["hashed_password"]):
+    if not db_user or not await verify_password(user.password, db_user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     
     access_token = create_access_token(data={"sub": user.email})
@@ -67,23 +104,94 @@ async def read_users_me(current_user: UserModel = Depends(get_current_user)):
 async def add_color(color: str = Form(...), current_user: UserModel = Depends(get_current_user)):
     # Avoid duplicates
     if color not in current_user.colors:
+        # current_user.id is a str, which never matches the stored ObjectId; email is unique per user
         await db.users.update_one(
-            {"_id": current_user.id},
+            {"email": current_user.email},
             {"$push": {"colors": color}}
         )
+        invalidate_user(current_user.email)
     return {"message": "Color added", "colors": current_user.colors + [color] if color not in current_user.colors else current_user.colors}
 
+CLOUD_PAGE_SIZE = 50
+CLOUD_MAX_PAGE_SIZE = 200
+
+def encode_cloud_cursor(img):
+    # Legacy records may still have a string (or no) created_at until ensure_indexes has backfilled them,
+    # so the cursor records the value's type to resume in the same place of Mongo's sort order
+    created_at = img.get("created_at")
+    if isinstance(created_at, datetime):
+        raw = f"d|{created_at.isoformat()}|{img['_id']}"
+    elif isinstance(created_at, str):
+        raw = f"s|{created_at}|{img['_id']}"
+    else:
+        raw = f"n||{img['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cloud_cursor(cursor):
+    try:
+        kind, created_at, _id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 2)
+        if kind == "d":
+            created_at = datetime.fromisoformat(created_at)
+        elif kind == "n":
+            created_at = None
+        elif kind != "s":
+            raise ValueError(kind)
+        return kind, created_at, ObjectId(_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def cloud_cursor_query(kind, created_at, _id):
+    """Records after the cursor in (created_at desc, _id desc) order. Newest first: dates, then strings, then null/missing."""
+    if kind == "n":
+        return [{"created_at": None, "_id": {"$lt": _id}}]
+    after = [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": _id}},
+    ]
+    # $lt only compares values of the same type, so the types that sort after this one are added explicitly
+    sorts_before = ["date"] if kind == "d" else ["date", "string"]
+    after.append({"$nor": [{"created_at": {"$type": t}} for t in sorts_before]})
+    return after
+
 @app.get("/cloud-images")
-async def get_cloud_images(current_user: UserModel = Depends(get_current_user)):
-    # Retrieve images generated by this user
-    # We need to store them in DB first. Let's say collection 'images'
-    cursor = db.images.find({"user_id": str(current_user.id)})
-    images = await cursor.to_list(length=100)
+async def get_cloud_images(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = CLOUD_PAGE_SIZE,
+    include_spec: bool = False,
+    current_user: UserModel = Depends(get_current_user),
+):
+    """
+    Newest-first page of the user's cloud gallery: {"images": [...], "next_cursor": str | None}.
+    Pass next_cursor back as `cursor` for the following page (keyset over the
+    (user_id, created_at, _id) index, so deep pages cost the same as the first).
+    The embedded spec is omitted unless include_spec=true. Responses carry an ETag, and
+    If-None-Match gets a 304 when the page hasn't changed, so polling is cheap.
+    """
+    limit = max(1, min(limit, CLOUD_MAX_PAGE_SIZE))
+    query = {"user_id": str(current_user.id)}
+    if cursor:
+        query["$or"] = cloud_cursor_query(*decode_cloud_cursor(cursor))
+    projection = None if include_spec else {"spec": 0}
+
+    # One extra row tells us whether there's a next page
+    rows = db.images.find(query, projection).sort([("created_at", -1), ("_id", -1)]).limit(limit + 1)
+    images = await rows.to_list(length=limit + 1)
+    next_cursor = encode_cloud_cursor(images[limit - 1]) if len(images) > limit else None
+    images = images[:limit]
+
     # Convert ObjectId to str
     for img in images:
         if "_id" in img:
             img["_id"] = str(img["_id"])
-    return images
+
+    body = {"images": images, "next_cursor": next_cursor}
+    etag = '"' + hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()[:32] + '"'
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return body
 
 # ---------------- EXTRACT ----------------
 @app.post("/extract")
@@ -118,6 +226,88 @@ async def extract(
     return spec
 
 
+# ---------------- CLOUD COLOUR VARIANTS ----------------
+async def save_creatives(user_id, batch_id, outputs, spec, color):
+    """
+    Stores one render's files and upserts its cloud gallery records. Returns {fmt: {ext: url}}.
+    Formats that failed to compose are skipped.
+    """
+    # Content-addressed keys: identical renders map to the same file and the write is skipped
+    rendered = {}
+    for fmt, file_map in outputs.items():
+        if fmt == "validation" or "error" in file_map:
+            continue
+        # file_map is {'png': bytes, 'jpg': bytes}
+        rendered[fmt] = {ext: hashlib.sha256(data).hexdigest() for ext, data in file_map.items()}
+
+    # Write the whole batch concurrently
+    urls = await storage.save_many({
+        f"{hashes[ext]}.{ext}": outputs[fmt][ext]
+        for fmt, hashes in rendered.items() for ext in hashes
+    })
+    stored = {fmt: {ext: urls[f"{h}.{ext}"] for ext, h in hashes.items()} for fmt, hashes in rendered.items()}
+
+    # Save metadata to DB: one unordered bulk write per variant batch, issued after its files are stored.
+    # One record per (user, identical creative): re-renders bump render_count (how many times it was
+    # produced; not a reference count, and files are shared across users, so it can't gate deletion)
+    # instead of duplicating, and batch_ids lists every batch the creative was produced in
+    created_at = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "content_hash": hashes.get("png") or hashes.get("jpg")},
+            {
+                "$setOnInsert": {
+                    "batch_id": batch_id,
+                    "urls": stored[fmt], # {png: url, jpg: url}
+                    "hashes": hashes,
+                    "format": fmt,
+                    "color": color,
+                    "spec": spec,
+                    "created_at": created_at,
+                },
+                "$inc": {"render_count": 1},
+                "$addToSet": {"batch_ids": batch_id},
+            },
+            upsert=True,
+        )
+        for fmt, hashes in rendered.items()
+    ]
+    if operations:
+        await db.images.bulk_write(operations, ordered=False)
+    return stored
+
+async def generate_color_variant(job, color):
+    """Job step: render one colour variant of the job's spec and store it in the user's cloud gallery."""
+    payload = job.payload
+
+    # Create a localized spec
+    color_spec = payload["spec"].copy()
+    color_spec["background_color"] = color
+
+    results = await render_service.generate_colors(payload["spec"], payload["product_bytes"], payload["logo_bytes"], [color])
+
+    # Identify this batch
+    batch_id = str(uuid.uuid4())
+    await save_creatives(job.user_id, batch_id, results[color], color_spec, color)
+
+    return {"color": color, "batch_id": batch_id}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: UserModel = Depends(get_current_user)):
+    job = job_queue.get(job_id)
+    if job is None or job.user_id != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: str, current_user: UserModel = Depends(get_current_user)):
+    job = job_queue.get(job_id)
+    if job is None or job.user_id != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job_queue.retry(job_id) is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}; only failed jobs can be retried")
+    return job.to_dict()
+
 # ---------------- GENERATE IMAGES ----------------
 @app.post("/generate-images")
 async def generate_images(
@@ -126,42 +316,43 @@ async def generate_images(
     product_image_2: Optional[UploadFile] = Form(None),
     product_image_3: Optional[UploadFile] = Form(None),
     logo_image: UploadFile = Form(...),
+    response_mode: Optional[str] = Form("base64"), # "base64" (JSON, default) or "multipart" (streamed raw files)
     authorization: Optional[str] = Header(None) # Manual token extraction for mixed usage
 ):
     spec_dict = json.loads(spec)
 
-    # Read Primary Image
-    product_bytes = await product_image.read()
-    logo_bytes = await logo_image.read()
-    
-    products = []
-    
-    # 1. Primary
-    p1 = Image.open(io.BytesIO(product_bytes)).convert("RGBA")
-    products.append(p1)
-    
-    # 2. Secondary
+    # Read uploads (decoding happens in the render worker)
+    product_bytes = [await product_image.read()]
     if product_image_2:
-        b2 = await product_image_2.read()
-        p2 = Image.open(io.BytesIO(b2)).convert("RGBA")
-        products.append(p2)
-        
-    # 3. Tertiary
+        product_bytes.append(await product_image_2.read())
     if product_image_3:
-        b3 = await product_image_3.read()
-        p3 = Image.open(io.BytesIO(b3)).convert("RGBA")
-        products.append(p3)
+        product_bytes.append(await product_image_3.read())
+    logo_bytes = await logo_image.read()
 
-    logo = Image.open(io.BytesIO(logo_bytes)).convert("RGBA")
+    if response_mode == "multipart":
+        # Queue cloud variants first; the stream below may take a while to drain
+        cloud_job = await submit_cloud_variants(authorization, spec_dict, product_bytes, logo_bytes)
+        boundary = uuid.uuid4().hex
+        return StreamingResponse(
+            stream_creatives(spec_dict, product_bytes, logo_bytes, boundary, cloud_job),
+            media_type=f"multipart/mixed; boundary={boundary}",
+        )
 
     # Generate for the REQUESTED spec (immediate return)
-    primary_outputs = generate_all(
-        spec=spec_dict,
-        products=products,
-        logo=logo,
-    )
+    try:
+        primary_outputs = await render_service.generate(spec_dict, product_bytes, logo_bytes)
+    except RenderUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    # ---------------- DYNAMIC CLOUD GENERATION ----------------
+    cloud_job = await submit_cloud_variants(authorization, spec_dict, product_bytes, logo_bytes)
+    if cloud_job:
+        primary_outputs["cloud_job"] = cloud_job
+
+    return primary_outputs
+
+# ---------------- DYNAMIC CLOUD GENERATION ----------------
+async def submit_cloud_variants(authorization, spec_dict, product_bytes, logo_bytes):
+    """Queues the colour-variant job for logged-in users. Returns its {job_id, status_url} or None."""
     # Check if user is authenticated
     user = None
     if authorization:
@@ -172,64 +363,215 @@ async def generate_images(
         except Exception:
             pass # Invalid token, ignore
     
-    if user:
-        # User is logged in. 
-        # Requirement: "generated from all that colors stored... viewd in cloud url"
-        stored_colors = user.colors
-        
-        # Also include the current requested color if not in stored? 
-        # Requirement says "generated from all that colors stored".
-        # We'll iterate through stored colors.
-        # Combine stored colors with the current requested color to ensure cloud history is populated
-        unique_colors = set(stored_colors)
-        current_bg = spec_dict.get("background_color")
-        if current_bg:
-            unique_colors.add(current_bg)
-        
-        print(f"DEBUG: User {user.email} found. Generataing for colors: {unique_colors}")
-        
-        for color in unique_colors:
-            # Create a localized spec
-            color_spec = spec_dict.copy()
-            color_spec["background_color"] = color
-            
-            # Generate
-            color_outputs = generate_all(color_spec, products, logo)
-            
-            # Identify this batch
-            batch_id = str(uuid.uuid4())
-            
-            # Save to disk and DB
-            for fmt, file_map in color_outputs.items():
-                if fmt == "validation":
+    if not user:
+        return None
+
+    # User is logged in. 
+    # Requirement: "generated from all that colors stored... viewd in cloud url"
+    stored_colors = user.colors
+    
+    # Also include the current requested color if not in stored? 
+    # Requirement says "generated from all that colors stored".
+    # We'll iterate through stored colors.
+    # Combine stored colors with the current requested color to ensure cloud history is populated
+    unique_colors = set(stored_colors)
+    current_bg = spec_dict.get("background_color")
+    if current_bg:
+        unique_colors.add(current_bg)
+    
+    print(f"DEBUG: User {user.email} found. Generataing for colors: {unique_colors}")
+
+    # Colour variants render in the background; the client polls /jobs/{job_id} for progress
+    job = job_queue.submit(
+        user_id=str(user.id),
+        kind="color_variants",
+        steps=sorted(unique_colors),
+        handler=generate_color_variant,
+        payload={"spec": dict(spec_dict), "product_bytes": product_bytes, "logo_bytes": logo_bytes},
+    )
+    return {"job_id": job.id, "status_url": f"/jobs/{job.id}"}
+
+# ---------------- STREAMED (MULTIPART) RESPONSE ----------------
+def multipart_part(boundary, content_type, body, name, filename=None):
+    disposition = f'attachment; name="{name}"'
+    if filename:
+        disposition += f'; filename="{filename}"'
+    head = (
+        f"--{boundary}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Disposition: {disposition}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode()
+    return head + body + b"\r\n"
+
+async def stream_creatives(spec_dict, product_bytes, logo_bytes, boundary, cloud_job=None):
+    """
+    multipart/mixed body: a JSON "validation" part first (plus cloud_job), then one raw
+    image part per format/extension as soon as that format finishes rendering.
+    Formats that fail to compose get a JSON part named after the format instead.
+    """
+    try:
+        async for fmt, result in render_service.stream(spec_dict, product_bytes, logo_bytes):
+            if fmt == "validation":
+                if cloud_job:
+                    result["cloud_job"] = cloud_job
+                yield multipart_part(boundary, "application/json", json.dumps(result).encode(), "validation")
+            elif "error" in result:
+                yield multipart_part(boundary, "application/json", json.dumps(result).encode(), fmt)
+            else:
+                for ext, data in result.items():
+                    content_type = "image/png" if ext == "png" else "image/jpeg"
+                    yield multipart_part(boundary, content_type, data, fmt, filename=f"{fmt}.{ext}")
+    except RenderUnavailable as e:
+        # Headers are already sent; report the failure in-band
+        yield multipart_part(boundary, "application/json", json.dumps({"error": str(e)}).encode(), "error")
+    yield f"--{boundary}--\r\n".encode()
+
+# ---------------- BATCH COPY VALIDATION ----------------
+@app.post("/validate-batch")
+async def validate_batch_endpoint(
+    file: UploadFile = Form(...),
+    format: Optional[str] = Form(None), # "jsonl" or "csv"; defaults from the file extension
+):
+    """
+    Text/spec validation for a whole copy deck without rendering. Streams NDJSON,
+    one {"row", "valid", "errors", "warnings", "hits"} line per input row.
+    """
+    fmt = detect_format(file.filename, format)
+    if fmt not in ("jsonl", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'jsonl' or 'csv'")
+
+    async def stream():
+        chunks = ndjson_chunks(file.file, fmt)
+        while True:
+            # Validation is CPU-bound; run each chunk off the event loop
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# ---------------- BULK CAMPAIGNS ----------------
+@app.post("/campaigns")
+async def create_campaign(
+    manifest: UploadFile = Form(...), # JSONL/CSV of specs; product_image(_2/_3) and logo_image name files in `assets`
+    assets: UploadFile = Form(...), # zip of packshots and logos
+    format: Optional[str] = Form(None), # "jsonl" or "csv"; defaults from the manifest's extension
+    current_user: UserModel = Depends(get_current_user),
+):
+    """
+    Renders every manifest row across all FORMATS into the user's cloud gallery under one batch.
+    Streams NDJSON: a {"batch_id", "download_url"} line, one line per row as it finishes (urls, or errors), then a summary.
+    """
+    fmt = detect_format(manifest.filename, format)
+    if fmt not in ("jsonl", "csv"):
+        raise HTTPException(status_code=400, detail="format must be 'jsonl' or 'csv'")
+    try:
+        campaign_assets = await asyncio.to_thread(CampaignAssets, assets.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="assets must be a zip file")
+
+    batch_id = str(uuid.uuid4())
+    rows = iter_specs(io.TextIOWrapper(manifest.file, encoding="utf-8-sig", newline=""), fmt)
+    return StreamingResponse(
+        stream_campaign(str(current_user.id), batch_id, rows, campaign_assets),
+        media_type="application/x-ndjson",
+    )
+
+async def render_campaign_row(user_id, batch_id, row, spec, error, assets):
+    result = {"row": row}
+    if spec is not None and (spec.get("id") or spec.get("sku")):
+        result["id"] = spec.get("id") or spec.get("sku")
+    if spec is None:
+        return {**result, "status": "failed", "errors": [error]}
+
+    # Any failure (missing or undecodable image, render error, storage error) fails only this row
+    try:
+        spec, product_bytes, logo_bytes = await asyncio.to_thread(row_inputs, spec, assets)
+        outputs = await render_service.generate_raw(spec, product_bytes, logo_bytes)
+        validation = outputs["validation"]
+        if not validation["valid"]:
+            return {**result, "status": "invalid", "errors": validation["errors"]}
+        urls = await save_creatives(user_id, batch_id, outputs, spec, spec.get("background_color"))
+    except KeyError as e:
+        return {**result, "status": "failed", "errors": [str(e.args[0]) if e.args else str(e)]}
+    except Exception as e:
+        return {**result, "status": "failed", "errors": [str(e) or type(e).__name__]}
+
+    # Formats that failed to compose are reported, the rest of the row still counts as done
+    format_errors = [f"{fmt}: {r['error']}" for fmt, r in outputs.items() if fmt != "validation" and "error" in r]
+    return {**result, "status": "done", "urls": urls, "errors": format_errors}
+
+async def stream_campaign(user_id, batch_id, rows, assets):
+    """Renders up to CAMPAIGN_CONCURRENCY rows at a time, yielding each row's NDJSON line as it completes."""
+    counts = {"done": 0, "invalid": 0, "failed": 0}
+    pending = set()
+    rows = iter(rows)
+    exhausted = False
+    try:
+        yield (json.dumps({"batch_id": batch_id, "download_url": f"/batches/{batch_id}/download"}) + "\n").encode()
+        while pending or not exhausted:
+            # Manifest rows are pulled only as render slots free up
+            while not exhausted and len(pending) < CAMPAIGN_CONCURRENCY:
+                row = next(rows, None)
+                if row is None:
+                    exhausted = True
+                else:
+                    pending.add(asyncio.create_task(render_campaign_row(user_id, batch_id, *row, assets)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                counts[result["status"]] += 1
+                yield (json.dumps(result) + "\n").encode()
+        yield (json.dumps({"summary": {"batch_id": batch_id, "rows": sum(counts.values()), **counts}}) + "\n").encode()
+    finally:
+        # Client went away or we're done: don't leave renders running for nobody
+        for task in pending:
+            task.cancel()
+        assets.close()
+
+# ---------------- BATCH DOWNLOAD ----------------
+@app.get("/batches/{batch_id}/download")
+async def download_batch(batch_id: str, current_user: UserModel = Depends(get_current_user)):
+    """
+    Every format/extension of one batch (colour variant or campaign) as a zip, streamed straight
+    from storage: nothing is buffered beyond one read chunk and no temp file is written.
+    """
+    query = {
+        "user_id": str(current_user.id),
+        "$or": [{"batch_id": batch_id}, {"batch_ids": batch_id}],
+    }
+    projection = {"urls": 1, "url": 1, "format": 1, "color": 1, "spec.sku": 1, "spec.id": 1}
+    if await db.images.find_one(query, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    async def entries():
+        seen = set()
+        async for img in db.images.find(query, projection).sort("_id", 1):
+            # Legacy records have a single png "url"
+            urls = img.get("urls") or ({"png": img["url"]} if img.get("url") else {})
+            spec = img.get("spec") or {}
+            folder = str(spec.get("sku") or spec.get("id") or img.get("color") or "creative").replace("/", "_").lstrip("#")
+            for ext, url in urls.items():
+                key = storage.key_for_url(url)
+                if not await storage.exists(key):
+                    # Headers are already sent, so a missing file is left out rather than failing the zip
+                    print(f"Batch {batch_id}: {key} missing from storage, skipped")
                     continue
-                
-                # file_map is {'png': ..., 'jpg': ...}
-                stored_urls = {}
-                
-                for ext, b64_data in file_map.items():
-                    img_data = base64.b64decode(b64_data)
-                    filename = f"{user.id}_{uuid.uuid4()}.{ext}"
-                    path = os.path.join("assets", "generated", filename)
-                    
-                    with open(path, "wb") as f:
-                        f.write(img_data)
-                    
-                    stored_urls[ext] = f"http://127.0.0.1:8000/static/{filename}"
-                
-                # Save metadata to DB
-                # Group: user_id + batch_id
-                await db.images.insert_one({
-                    "user_id": str(user.id),
-                    "batch_id": batch_id,
-                    "urls": stored_urls, # {png: url, jpg: url}
-                    "format": fmt,
-                    "color": color,
-                    "spec": color_spec,
-                    "created_at": str(uuid.uuid1()) # Simple timestamp proxy or use ISO
-                })
+                name = f"{folder}/{img.get('format', 'creative')}.{ext}"
+                if name in seen:
+                    name = f"{folder}/{img.get('format', 'creative')}_{key[:8]}.{ext}"
+                seen.add(name)
+                yield name, storage.iter_chunks(key)
 
-    return primary_outputs
+    return StreamingResponse(
+        stream_zip(entries()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="batch_{batch_id}.zip"'},
+    )
 
 # ---------------- AI GEN EXTENSION ----------------
 @app.post("/ai-generate")
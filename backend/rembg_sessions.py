@@ -0,0 +1,108 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+try:
+    import onnxruntime as ort
+    from rembg.sessions import sessions_class
+    HAS_SESSIONS = True
+except Exception as e:
+    print(f"Warning: rembg sessions unavailable: {e}")
+    HAS_SESSIONS = False
+
+# --- CONFIG ---
+REMBG_MODEL = os.getenv("REMBG_MODEL", "u2net")
+# Sessions are ~170MB each for u2net; keep the pool small.
+REMBG_POOL_SIZE = max(1, int(os.getenv("REMBG_POOL_SIZE", "1")))
+# Defaults suit a 1-CPU pod: ONNX otherwise spawns one thread per visible core per session.
+REMBG_INTRA_OP_THREADS = int(os.getenv("REMBG_INTRA_OP_THREADS", "1"))
+REMBG_INTER_OP_THREADS = int(os.getenv("REMBG_INTER_OP_THREADS", "1"))
+
+
+class SessionPool:
+    """
+    Process-wide pool of rembg/ONNX sessions.
+    Sessions are created lazily up to `size` (or eagerly via warmup()) and handed out
+    one per caller, so worker threads never share a session concurrently.
+    """
+
+    def __init__(self, model_name, size, intra_op_threads, inter_op_threads):
+        self.model_name = model_name
+        self.size = size
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new_session(self):
+        # Built from the session class directly: rembg's new_session() creates its own
+        # sess_opts (and on some versions passes it alongside ours, raising TypeError).
+        session_class = next((sc for sc in sessions_class if sc.name() == self.model_name), None)
+        if session_class is None:
+            raise ValueError(f"No rembg session class for model '{self.model_name}'")
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = self.intra_op_threads
+        opts.inter_op_num_threads = self.inter_op_threads
+        return session_class(self.model_name, opts)
+
+    def warmup(self):
+        """Creates every session up front so the first request doesn't pay for model load."""
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._new_session())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    @contextmanager
+    def session(self):
+        sess = None
+        try:
+            sess = self._idle.get_nowait()
+        except queue.Empty:
+            create = False
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+            if create:
+                try:
+                    sess = self._new_session()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                # Pool exhausted: wait for another thread to hand one back.
+                sess = self._idle.get()
+        try:
+            yield sess
+        finally:
+            self._idle.put(sess)
+
+
+session_pool = SessionPool(
+    model_name=REMBG_MODEL,
+    size=REMBG_POOL_SIZE,
+    intra_op_threads=REMBG_INTRA_OP_THREADS,
+    inter_op_threads=REMBG_INTER_OP_THREADS,
+) if HAS_SESSIONS else None
+
+
+def warmup_sessions():
+    """Preloads the rembg model(s). Safe to call when rembg isn't installed."""
+    if session_pool is None:
+        return
+    try:
+        session_pool.warmup()
+        print(f"rembg: {session_pool.size} '{session_pool.model_name}' session(s) ready")
+    except Exception as e:
+        # Not fatal: sessions are retried on first use, and remove_bg falls back to simple removal meanwhile
+        print(f"Warning: rembg warmup failed for '{session_pool.model_name}': {type(e).__name__}: {e}")
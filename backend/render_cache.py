@@ -0,0 +1,148 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from formats import FORMATS
+
+# --- CONFIG ---
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "128"))
+
+
+def request_key(spec, product_bytes, logo_bytes):
+    """
+    Canonical hash of everything that determines a render: the spec (key order normalized,
+    background colour included), every upload's bytes and the active FORMATS.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps(spec, sort_keys=True, separators=(",", ":"), default=str).encode())
+    for b in product_bytes:
+        h.update(hashlib.sha256(b).digest())
+    h.update(b"logo")
+    h.update(hashlib.sha256(logo_bytes).digest())
+    h.update(json.dumps(FORMATS, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def outputs_size(outputs):
+    """Approximate memory held by a generate_all(raw=True) result."""
+    size = 1024
+    for fmt, file_map in outputs.items():
+        if fmt != "validation":
+            size += sum(len(v) for v in file_map.values())
+    return size
+
+
+def copy_outputs(outputs):
+    """
+    Copy callers can annotate or mutate without touching the cached result: validation (small,
+    with nested error/warning lists) deeply, per-format file maps one level (the bytes are immutable).
+    """
+    return {k: copy.deepcopy(v) if k == "validation" else dict(v) for k, v in outputs.items()}
+
+
+class RenderCache:
+    """
+    Byte-bounded LRU of finished renders (raw PNG/JPEG bytes + validation), with coalescing:
+    identical requests arriving while one is rendering wait for that render instead of starting their own.
+    Lives in the API process, so it is shared by every render worker.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return copy_outputs(entry[0])
+
+    def put(self, key, outputs):
+        size = outputs_size(outputs)
+        if size > self.max_bytes:
+            return
+        if key in self._items:
+            self._bytes -= self._items.pop(key)[1]
+        self._items[key] = (outputs, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, old_size) = self._items.popitem(last=False)
+            self._bytes -= old_size
+
+    def inflight(self, key):
+        return self._inflight.get(key)
+
+    def begin(self, key):
+        """Registers the caller as the one rendering `key`; returns the future followers will await."""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+
+    def finish(self, key, future, outputs=None, error=None):
+        self._inflight.pop(key, None)
+        if isinstance(error, asyncio.CancelledError):
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+            # Followers may not exist; don't warn about an unretrieved exception
+            future.exception()
+        else:
+            self.put(key, outputs)
+            future.set_result(outputs)
+
+    async def get_or_compute(self, key, compute):
+        """Cached result, or the in-flight one, or runs `compute()` (an awaitable factory) and caches it."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        future = self.inflight(key)
+        if future is not None:
+            self.coalesced += 1
+            return copy_outputs(await asyncio.shield(future))
+
+        self.misses += 1
+        future = self.begin(key)
+        # Run as its own task so a disconnecting client doesn't cancel work others are waiting on
+        task = asyncio.ensure_future(compute())
+        try:
+            outputs = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.add_done_callback(lambda t: self._finish_task(key, future, t))
+            raise
+        except Exception as e:
+            self.finish(key, future, error=e)
+            raise
+        self.finish(key, future, outputs=outputs)
+        return copy_outputs(outputs)
+
+    def _finish_task(self, key, future, task):
+        if task.cancelled():
+            self.finish(key, future, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self.finish(key, future, error=task.exception())
+        else:
+            self.finish(key, future, outputs=task.result())
+
+    def stats(self):
+        return {
+            "items": len(self._items),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "inflight": len(self._inflight),
+        }
+
+
+render_cache = RenderCache(RENDER_CACHE_MAX_MB * 1024 * 1024)
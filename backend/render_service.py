@@ -0,0 +1,324 @@
+import asyncio
+import base64
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from PIL import Image
+
+from formats import FORMATS
+from render_cache import render_cache, request_key, copy_outputs
+
+# --- CONFIG ---
+# Number of render worker processes. 0 renders in a thread of the API process instead
+# (useful for local dev / debugging, but rendering then competes with the event loop for the GIL).
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "1"))
+# Recent uploads whose prepared assets/foreground layers each worker keeps (~20MB each)
+RENDER_ASSETS_CACHE_SIZE = int(os.getenv("RENDER_ASSETS_CACHE_SIZE", "4"))
+# Foreground layers kept per upload (one per format per distinct layout; full-canvas RGBA, several MB each)
+RENDER_FOREGROUND_CACHE_SIZE = int(os.getenv("RENDER_FOREGROUND_CACHE_SIZE", str(2 * len(FORMATS))))
+
+
+class RenderUnavailable(Exception):
+    """Raised when the worker pool keeps crashing and a render can't be completed."""
+
+
+# ---------------- WORKER SIDE ----------------
+# Everything below runs inside the worker processes, so inputs are raw upload bytes
+# (cheap to pickle) and decoding happens off the API process.
+
+_assets_cache = OrderedDict()
+_assets_lock = threading.Lock()  # Only contended when RENDER_WORKERS=0 (thread mode)
+
+
+class ForegroundCache:
+    """
+    Bounded LRU of foreground layers for one upload, used as generate_all's `foregrounds`.
+    Every distinct spec adds a layer per format, so without a bound a long-lived worker
+    that sees many specs for the same uploads would keep all of them.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()  # parallel formats write concurrently
+
+    def get(self, key):
+        with self._lock:
+            fg = self._items.get(key)
+            if fg is not None:
+                self._items.move_to_end(key)
+            return fg
+
+    def __setitem__(self, key, fg):
+        with self._lock:
+            self._items[key] = fg
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _init_worker():
+    from rembg_sessions import warmup_sessions
+    from composer import preload_fonts
+    warmup_sessions()
+    preload_fonts(FORMATS)
+
+
+def _ping():
+    return os.getpid()
+
+
+def worker_stats():
+    from composer import font_stats
+    from cutout_cache import cutout_cache
+    from validator import image_validation_stats
+    return {
+        "pid": os.getpid(),
+        "fonts": font_stats(),
+        "cutout_cache": cutout_cache.stats(),
+        "image_validation_cache": image_validation_stats(),
+    }
+
+
+def decode_images(product_bytes, logo_bytes):
+    products = [Image.open(io.BytesIO(b)).convert("RGBA") for b in product_bytes]
+    logo = Image.open(io.BytesIO(logo_bytes)).convert("RGBA")
+    return products, logo
+
+
+def render_primary(spec, product_bytes, logo_bytes, raw=False):
+    from generate_creatives import generate_all
+    products, logo = decode_images(product_bytes, logo_bytes)
+    return generate_all(spec, products, logo, raw=raw)
+
+
+def _request_assets(product_bytes, logo_bytes, prepare=True):
+    """
+    Decoded uploads, prepared assets and foreground layers for one set of uploads, kept in a
+    small per-worker LRU. Colour-variant jobs and streamed formats render one piece per call,
+    so this is what lets them share work. Preparation is deferred until `prepare` is requested.
+    """
+    h = hashlib.sha256()
+    for b in list(product_bytes) + [logo_bytes]:
+        h.update(hashlib.sha256(b).digest())
+    key = h.hexdigest()
+
+    with _assets_lock:
+        entry = _assets_cache.get(key)
+        if entry is not None:
+            _assets_cache.move_to_end(key)
+    if entry is None:
+        products, logo = decode_images(product_bytes, logo_bytes)
+        entry = {"products": products, "logo": logo, "prepared": None, "foregrounds": ForegroundCache(RENDER_FOREGROUND_CACHE_SIZE)}
+        with _assets_lock:
+            _assets_cache[key] = entry
+            while len(_assets_cache) > RENDER_ASSETS_CACHE_SIZE:
+                _assets_cache.popitem(last=False)
+
+    if prepare and entry["prepared"] is None:
+        from composer import prepare_assets
+        entry["prepared"] = prepare_assets(entry["products"], entry["logo"], widths=[W for W, _ in FORMATS.values()])
+    return entry
+
+
+def render_colors(spec, product_bytes, logo_bytes, colors, raw=False):
+    """
+    Renders one generate_all output per background colour. All colours share one preparation
+    stage and one foreground layer per format; each extra colour is just a composite + export.
+    """
+    from generate_creatives import generate_all
+    assets = _request_assets(product_bytes, logo_bytes)
+
+    results = {}
+    for color in colors:
+        color_spec = spec.copy()
+        color_spec["background_color"] = color
+        results[color] = generate_all(
+            color_spec, assets["products"], assets["logo"],
+            prepared=assets["prepared"], foregrounds=assets["foregrounds"], raw=raw,
+        )
+    return results
+
+
+def validate_upload(spec, product_bytes, logo_bytes):
+    """Runs generate_all's validation only. Returns (validation, spec) since validation may amend the spec."""
+    from generate_creatives import validate_request
+    assets = _request_assets(product_bytes, logo_bytes, prepare=False)
+    validation = validate_request(spec, assets["products"])
+    return validation, spec
+
+
+def render_format_bytes(spec, product_bytes, logo_bytes, fmt):
+    """Renders a single format of an already validated spec to raw PNG/JPEG bytes."""
+    from generate_creatives import render_format
+    assets = _request_assets(product_bytes, logo_bytes)
+    W, H = FORMATS[fmt]
+    return render_format(
+        fmt, W, H, spec, assets["products"], assets["logo"], assets["prepared"],
+        foregrounds=assets["foregrounds"], raw=True,
+    )
+
+
+# ---------------- API SIDE ----------------
+def to_base64(outputs):
+    """Raw render outputs (as cached) -> the base64 JSON shape /generate-images returns."""
+    encoded = copy_outputs(outputs)
+    for fmt, file_map in encoded.items():
+        if fmt != "validation" and "error" not in file_map:
+            for ext, data in file_map.items():
+                file_map[ext] = base64.b64encode(data).decode()
+    return encoded
+
+
+def color_spec(spec, color):
+    spec = dict(spec)
+    spec["background_color"] = color
+    return spec
+
+
+class RenderService:
+    """
+    Runs CPU-bound creative generation in a process pool so the FastAPI event loop stays responsive.
+    Workers are spawned (not forked) and preload rembg + fonts in their initializer.
+    If a worker dies, the pool is rebuilt and the render retried once.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = None
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    async def start(self):
+        if self.workers <= 0:
+            await asyncio.to_thread(_init_worker)
+            return
+        self._executor = self._new_executor()
+        # Force every worker to spawn and finish its initializer now rather than on the first request
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*[loop.run_in_executor(self._executor, _ping) for _ in range(self.workers)])
+        print(f"Render service: {len(set(pids))} worker process(es) ready")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _restart(self, broken):
+        # Several in-flight requests can see the same broken pool; only the first replaces it
+        if self._executor is broken:
+            print("Render service: worker pool broken, restarting")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+
+    async def run(self, fn, *args):
+        if self.workers <= 0:
+            return await asyncio.to_thread(fn, *args)
+        if self._executor is None:
+            self._executor = self._new_executor()
+
+        loop = asyncio.get_running_loop()
+        for _ in range(2):
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                self._restart(executor)
+        raise RenderUnavailable("Render worker crashed twice while processing this request.")
+
+    async def stats(self):
+        """Cache/font counters from one render worker (or this process when RENDER_WORKERS=0)."""
+        return await self.run(worker_stats)
+
+    async def generate(self, spec, product_bytes, logo_bytes):
+        """Base64 outputs for every format; served from / shared via render_cache when possible."""
+        return to_base64(await self.generate_raw(spec, product_bytes, logo_bytes))
+
+    async def generate_raw(self, spec, product_bytes, logo_bytes):
+        """Like generate, with raw PNG/JPEG bytes."""
+        key = request_key(spec, product_bytes, logo_bytes)
+        return await render_cache.get_or_compute(
+            key, lambda: self.run(render_primary, dict(spec), product_bytes, logo_bytes, True)
+        )
+
+    async def stream(self, spec, product_bytes, logo_bytes):
+        """
+        Async generator for streamed responses: yields ("validation", dict) first, then
+        (fmt, {"png": bytes, "jpg": bytes} or {"error": str}) in completion order.
+        A cached or in-flight identical request is replayed instead of re-rendered.
+        """
+        key = request_key(spec, product_bytes, logo_bytes)
+        outputs = render_cache.get(key)
+        inflight = render_cache.inflight(key) if outputs is None else None
+        if inflight is not None:
+            render_cache.coalesced += 1
+            # wait() doesn't raise: if the leader failed or went away, render it ourselves below
+            await asyncio.wait({inflight})
+            if not inflight.cancelled() and inflight.exception() is None:
+                outputs = copy_outputs(inflight.result())
+        if outputs is not None:
+            yield "validation", outputs.pop("validation")
+            for fmt, result in outputs.items():
+                yield fmt, result
+            return
+
+        render_cache.misses += 1
+        future = render_cache.begin(key)
+        collected = {}
+        try:
+            validation, spec = await self.run(validate_upload, dict(spec), product_bytes, logo_bytes)
+            collected["validation"] = validation
+            yield "validation", dict(validation)
+            if validation["valid"]:
+                async def one(fmt):
+                    return fmt, await self.run(render_format_bytes, spec, product_bytes, logo_bytes, fmt)
+
+                for next_done in asyncio.as_completed([one(fmt) for fmt in FORMATS]):
+                    fmt, result = await next_done
+                    collected[fmt] = result
+                    yield fmt, dict(result)
+        except BaseException as e:
+            # Includes GeneratorExit when the client disconnects mid-stream
+            render_cache.finish(key, future, error=e if isinstance(e, Exception) else asyncio.CancelledError())
+            raise
+        # Stored in FORMATS order like generate_all, whatever order the formats finished in
+        ordered = {"validation": collected["validation"]}
+        ordered.update({fmt: collected[fmt] for fmt in FORMATS if fmt in collected})
+        render_cache.finish(key, future, outputs=ordered)
+
+    async def generate_colors(self, spec, product_bytes, logo_bytes, colors):
+        """
+        Raw outputs per colour. Colours already in render_cache are reused; the rest are rendered
+        together in one worker call so they share preparation and foreground layers.
+        """
+        results = {}
+        missing = []
+        for color in colors:
+            cached = render_cache.get(request_key(color_spec(spec, color), product_bytes, logo_bytes))
+            if cached is not None:
+                results[color] = cached
+            else:
+                missing.append(color)
+
+        if missing:
+            render_cache.misses += len(missing)
+            rendered = await self.run(render_colors, dict(spec), product_bytes, logo_bytes, missing, True)
+            for color, outputs in rendered.items():
+                render_cache.put(request_key(color_spec(spec, color), product_bytes, logo_bytes), outputs)
+                results[color] = copy_outputs(outputs)
+        return results
+
+render_service = RenderService(RENDER_WORKERS)
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import uuid
+from abc import ABC, abstractmethod
+
+try:
+    import boto3
+    HAS_BOTO3 = True
+except ImportError:
+    HAS_BOTO3 = False
+
+# --- CONFIG ---
+# "local" writes under STORAGE_LOCAL_DIR (served by the API at /static), "s3" uses any S3-compatible store (AWS, MinIO)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", "assets/generated")
+# Base URL clients use to fetch stored files; set it to the public host when behind a load balancer / CDN
+STORAGE_PUBLIC_URL = os.getenv("STORAGE_PUBLIC_URL", "")
+S3_BUCKET = os.getenv("S3_BUCKET", "creatives")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") # e.g. http://localhost:9000 for MinIO; unset for AWS
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY")
+
+READ_CHUNK_SIZE = 256 * 1024
+
+CONTENT_TYPES = {"png": "image/png", "jpg": "image/jpeg", "jpeg": "image/jpeg", "zip": "application/zip"}
+
+
+class Storage(ABC):
+    """Where generated files live. Keys are flat filenames; all I/O is async and never blocks the event loop."""
+
+    def __init__(self, public_url):
+        self.public_url = public_url.rstrip("/")
+
+    def url(self, key):
+        return f"{self.public_url}/{key}"
+
+    def key_for_url(self, url):
+        """Inverse of url(). Records stored under an older public URL fall back to the file name."""
+        prefix = self.public_url + "/"
+        return url[len(prefix):] if url.startswith(prefix) else url.rsplit("/", 1)[-1]
+
+    @abstractmethod
+    async def exists(self, key):
+        """Whether `key` is stored."""
+
+    @abstractmethod
+    async def save(self, key, data):
+        """Stores `data` under `key` unless it's already there (keys are content hashes). Returns the key."""
+
+    @abstractmethod
+    def iter_chunks(self, key, chunk_size=READ_CHUNK_SIZE):
+        """
+        Async generator over the stored file's bytes, `chunk_size` at a time (never the whole file).
+        Implementations are `async def` generators.
+        """
+
+    async def save_many(self, items):
+        """Concurrent save() of {key: data}. Returns {key: url}."""
+        keys = list(items)
+        await asyncio.gather(*[self.save(key, items[key]) for key in keys])
+        return {key: self.url(key) for key in keys}
+
+
+class LocalStorage(Storage):
+    def __init__(self, directory, public_url):
+        super().__init__(public_url or "http://127.0.0.1:8000/static")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    async def exists(self, key):
+        return await asyncio.to_thread(os.path.exists, self.path(key))
+
+    def _write(self, key, data):
+        path = self.path(key)
+        if os.path.exists(path):
+            return
+        # Atomic: readers never see a half-written file, and concurrent writers of the same key are harmless
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def save(self, key, data):
+        await asyncio.to_thread(self._write, key, data)
+        return key
+
+    async def iter_chunks(self, key, chunk_size=READ_CHUNK_SIZE):
+        f = await asyncio.to_thread(open, self.path(key), "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            f.close()
+
+
+class S3Storage(Storage):
+    """
+    S3-compatible object storage (AWS S3, MinIO, ...). boto3 is synchronous, so each call runs
+    in a thread; boto3 clients are thread-safe, so one client is shared.
+    """
+
+    def __init__(self, bucket, endpoint_url, region, access_key_id, secret_access_key, public_url):
+        if not HAS_BOTO3:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+        if not public_url:
+            public_url = f"{endpoint_url.rstrip('/')}/{bucket}" if endpoint_url else f"https://{bucket}.s3.{region}.amazonaws.com"
+        super().__init__(public_url)
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+        )
+
+    def _exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def exists(self, key):
+        return await asyncio.to_thread(self._exists, key)
+
+    def _write(self, key, data):
+        if self._exists(key):
+            return
+        content_type = CONTENT_TYPES.get(key.rsplit(".", 1)[-1].lower(), "application/octet-stream")
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type)
+
+    async def save(self, key, data):
+        await asyncio.to_thread(self._write, key, data)
+        return key
+
+    async def iter_chunks(self, key, chunk_size=READ_CHUNK_SIZE):
+        response = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=key)
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+
+def create_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET, S3_ENDPOINT_URL, S3_REGION, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY, STORAGE_PUBLIC_URL)
+    if STORAGE_BACKEND != "local":
+        print(f"Warning: unknown STORAGE_BACKEND '{STORAGE_BACKEND}', using local")
+    return LocalStorage(STORAGE_LOCAL_DIR, STORAGE_PUBLIC_URL)
+
+
+storage = create_storage()
@@ -0,0 +1,112 @@
+import asyncio
+
+import httpx
+import pytest
+from bson import ObjectId
+
+import auth
+import main
+
+
+class FakeUsers:
+    """The two users-collection calls the cache and /colors make."""
+
+    def __init__(self, *emails):
+        self.docs = {e: {"_id": ObjectId(), "email": e, "hashed_password": "x", "colors": []} for e in emails}
+        self.finds = 0
+
+    async def find_one(self, query):
+        self.finds += 1
+        doc = self.docs.get(query["email"])
+        return dict(doc, colors=list(doc["colors"])) if doc else None
+
+    async def update_one(self, query, update):
+        self.docs[query["email"]]["colors"].append(update["$push"]["colors"])
+
+
+class FakeDB:
+    def __init__(self, users):
+        self.users = users
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def users(monkeypatch):
+    users = FakeUsers("a@b.com", "c@d.com", "e@f.com")
+    monkeypatch.setattr(auth, "db", FakeDB(users))
+    monkeypatch.setattr(main, "db", FakeDB(users))
+    monkeypatch.setattr(auth, "_user_cache", auth.OrderedDict())
+    monkeypatch.setattr(auth, "USER_CACHE_TTL_SECONDS", 30)
+    return users
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(auth, "time", clock)
+    return clock
+
+
+def current_user(email):
+    return asyncio.run(auth.get_current_user(auth.create_access_token({"sub": email})))
+
+
+def test_cached_user_expires_after_ttl(users, clock):
+    current_user("a@b.com")
+    clock.now += 29
+    current_user("a@b.com")
+    assert users.finds == 1
+    clock.now += 2
+    current_user("a@b.com")
+    assert users.finds == 2
+
+
+def test_mutating_returned_user_does_not_touch_cache(users, clock):
+    user = current_user("a@b.com")
+    user.colors.append("#000000")
+    user.email = "changed@b.com"
+    again = current_user("a@b.com")
+    assert again.colors == []
+    assert again.email == "a@b.com"
+    assert users.finds == 1
+
+
+def test_full_cache_drops_oldest_not_everything(users, clock, monkeypatch):
+    monkeypatch.setattr(auth, "USER_CACHE_MAX_ENTRIES", 2)
+    current_user("a@b.com")
+    clock.now += 1
+    current_user("c@d.com")
+    clock.now += 1
+    current_user("e@f.com")
+    assert list(auth._user_cache) == ["c@d.com", "e@f.com"]
+
+    # Expired entries go first, even below the size limit
+    clock.now += 29.5
+    monkeypatch.setattr(auth, "USER_CACHE_MAX_ENTRIES", 10)
+    current_user("a@b.com")
+    assert list(auth._user_cache) == ["e@f.com", "a@b.com"]
+
+
+def test_colors_invalidates_cached_user(users, clock):
+    token = auth.create_access_token({"sub": "a@b.com"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await auth.get_current_user(token)
+            response = await client.post("/colors", data={"color": "#123456"}, headers=headers)
+            assert response.status_code == 200
+            return await auth.get_current_user(token)
+
+    user = asyncio.run(scenario())
+    assert user.colors == ["#123456"]
+    # /colors itself was served from the cache; only the reload after it went to the database
+    assert users.finds == 2
@@ -0,0 +1,47 @@
+import io
+import json
+
+from batch_validation import ndjson_chunks, validate_batch
+
+VALID = {"main_message": "Fresh bread daily", "sub_message": "Baked in store", "tesco_tag": "Available at Tesco"}
+
+
+def deck(*rows):
+    return io.BytesIO("\n".join(json.dumps(row) for row in rows).encode())
+
+
+def results(*rows):
+    return [json.loads(line) for chunk in ndjson_chunks(deck(*rows)) for line in chunk.decode().splitlines()]
+
+
+def test_non_string_copy_field_is_a_row_error():
+    out = results(VALID, {**VALID, "main_message": 5}, VALID)
+    assert [r["row"] for r in out] == [1, 2, 3]
+    assert out[1]["valid"] is False
+    assert "main_message" in out[1]["errors"][0]
+
+
+def test_null_copy_field_is_a_row_error():
+    out = results({**VALID, "value_tile_type": "New", "value_tile_text": None}, VALID)
+    assert len(out) == 2
+    assert out[0]["valid"] is False
+    assert "value_tile_text" in out[0]["errors"][0]
+
+
+def test_rows_buffered_in_a_chunk_survive_a_bad_row():
+    rows = [VALID] * 5 + [{**VALID, "sub_message": None}] + [VALID] * 5
+    out = [json.loads(line) for chunk in ndjson_chunks(deck(*rows), chunk_rows=4) for line in chunk.decode().splitlines()]
+    assert [r["row"] for r in out] == list(range(1, 12))
+    assert [r["row"] for r in out if not r["valid"]] == [6]
+
+
+def test_unexpected_validator_error_does_not_end_the_stream(monkeypatch):
+    import batch_validation
+
+    def boom(spec):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(batch_validation, "validate_copy", boom)
+    out = list(validate_batch([json.dumps(VALID), json.dumps(VALID)]))
+    assert len(out) == 2
+    assert all(r["valid"] is False and "boom" in r["errors"][0] for r in out)
@@ -0,0 +1,32 @@
+import pytest
+
+from compliance_engine import compliance_engine
+from validator import validate_text_content
+
+
+def terms(text):
+    return {hit["term"] for hit in compliance_engine.scan(text) if hit["category"] != "price"}
+
+
+@pytest.mark.parametrize("main, term", [
+    ("Win prizes today", "prize"),
+    ("Guaranteed fresh", "guarantee"),
+    ("Refundable deposit", "refund"),
+    ("Meet the winners", "winner"),
+    ("Free returns", "return"),
+])
+def test_inflected_forbidden_terms_fail(main, term):
+    result = validate_text_content(main, "In store now", "")
+    assert result["valid"] is False
+    assert term in terms(main.lower())
+
+
+def test_term_inside_a_longer_word_does_not_match():
+    # "earth" in "hearth" and "green" in "evergreen" don't start a word
+    assert terms("evergreen hearth") == set()
+
+
+def test_hit_spans_are_field_relative():
+    result = validate_text_content("Fresh bread", "Win prizes", "")
+    hit = next(h for h in result["hits"] if h["term"] == "prize")
+    assert (hit["field"], hit["start"], hit["end"]) == ("sub_message", 4, 9)
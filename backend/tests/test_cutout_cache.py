@@ -0,0 +1,74 @@
+import os
+
+from PIL import Image
+
+import background_removal
+from cutout_cache import CutoutCache
+from image_hash import content_hash
+
+
+def cutout(color, size=(10, 10)):
+    return Image.new("RGBA", size, color)
+
+
+def test_memory_tier_evicts_least_recently_used_by_bytes():
+    one = 10 * 10 * 4
+    cache = CutoutCache(max_bytes=3 * one)
+    for i, key in enumerate("abc"):
+        cache.put(key, cutout((i, 0, 0, 255)))
+    assert cache.get("a") is not None
+    cache.put("d", cutout((9, 0, 0, 255)))
+
+    assert cache.get("b") is None
+    assert [cache.get(k).getpixel((0, 0))[0] for k in "acd"] == [0, 2, 9]
+    assert cache.stats()["bytes"] == 3 * one
+
+    # Bigger than the whole memory budget: never held
+    cache.put("big", cutout((1, 1, 1, 255), size=(100, 100)))
+    assert cache.get("big") is None
+
+
+def test_disk_hit_is_promoted_to_memory(tmp_path):
+    CutoutCache(max_bytes=10**6, disk_dir=str(tmp_path), disk_max_bytes=10**6).put("k", cutout((1, 2, 3, 255)))
+
+    # A fresh process: empty memory tier, same directory
+    cache = CutoutCache(max_bytes=10**6, disk_dir=str(tmp_path), disk_max_bytes=10**6)
+    first = cache.get("k")
+    second = cache.get("k")
+    assert first.getpixel((0, 0)) == second.getpixel((0, 0)) == (1, 2, 3, 255)
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["items"] == 1
+
+
+def test_disk_tier_prunes_oldest_files_beyond_budget(tmp_path):
+    cache = CutoutCache(max_bytes=10**6, disk_dir=str(tmp_path), disk_max_bytes=10**6)
+    for i, key in enumerate("abc"):
+        cache.put(key, Image.frombytes("RGBA", (40, 40), os.urandom(40 * 40 * 4)))
+        os.utime(tmp_path / f"{key}.png", (1000 + i, 1000 + i))
+    sizes = {key: (tmp_path / f"{key}.png").stat().st_size for key in "abc"}
+
+    # Not quite room for b and c: the next write evicts the oldest-accessed files (a, then b)
+    cache.disk_max_bytes = sizes["b"] + sizes["c"] - 1
+    cache.put("d", cutout((0, 0, 0, 255)))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["c.png", "d.png"]
+
+
+def test_fallback_cutout_is_not_cached(monkeypatch):
+    cache = CutoutCache(max_bytes=10**6)
+    monkeypatch.setattr(background_removal, "cutout_cache", cache)
+    monkeypatch.setattr(background_removal, "HAS_REMBG", True)
+    monkeypatch.setattr(background_removal, "session_pool", None)
+
+    def broken_remove(img, **kwargs):
+        raise RuntimeError("no model")
+
+    monkeypatch.setattr(background_removal, "remove", broken_remove, raising=False)
+    img = Image.new("RGB", (20, 20), "white")
+    result = background_removal.remove_bg(img)
+
+    # The simple fallback still produced a cutout, but it isn't stored under the rembg key
+    assert result.getpixel((0, 0))[3] == 0
+    key = content_hash(img, namespace=f"rembg:{background_removal.REMBG_MODEL}")
+    assert cache.get(key) is None
+    assert cache.stats()["items"] == 0
@@ -0,0 +1,123 @@
+import asyncio
+
+import httpx
+
+from jobs import DONE, FAILED, JobQueue
+
+
+class FlakyHandler:
+    """Job step handler that fails each step in `failures` that many times before succeeding."""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = []
+
+    async def __call__(self, job, step):
+        self.calls.append(step)
+        if self.failures.get(step, 0) > 0:
+            self.failures[step] -= 1
+            raise RuntimeError(f"{step} failed")
+        return {"step": step}
+
+
+async def wait_for(job, statuses=(DONE, FAILED)):
+    for _ in range(500):
+        if job.status in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job still {job.status}")
+
+
+def run_job(steps, handler, max_attempts=3):
+    async def main():
+        queue = JobQueue(workers=1, max_attempts=max_attempts, ttl_seconds=60)
+        await queue.start()
+        try:
+            return await wait_for(queue.submit("u1", "test", steps, handler, payload={"x": 1}))
+        finally:
+            await queue.stop()
+    return asyncio.run(main())
+
+
+def test_failed_step_succeeds_on_retry_attempt():
+    handler = FlakyHandler({"b": 1})
+    job = run_job(["a", "b", "c"], handler)
+    assert job.status == DONE
+    assert job.attempts == 2
+    assert job.completed == ["a", "b", "c"]
+    # "a" isn't re-run by the second attempt
+    assert handler.calls == ["a", "b", "b", "c"]
+    assert [e["step"] for e in job.errors] == ["b"]
+    assert job.payload is None
+
+
+def test_job_out_of_attempts_ends_failed():
+    handler = FlakyHandler({"b": 10})
+    job = run_job(["a", "b", "c"], handler, max_attempts=3)
+    assert job.status == FAILED
+    assert job.attempts == 3
+    assert job.completed == ["a"]
+    assert len(job.errors) == 3
+    # Kept for a retry
+    assert job.payload == {"x": 1}
+    assert job.to_dict()["completed"] == 1
+
+
+def test_finished_jobs_pruned_after_ttl():
+    async def main():
+        queue = JobQueue(workers=1, max_attempts=1, ttl_seconds=60)
+        await queue.start()
+        try:
+            old = await wait_for(queue.submit("u1", "test", ["a"], FlakyHandler(), None))
+            recent = await wait_for(queue.submit("u1", "test", ["a"], FlakyHandler(), None))
+            old.updated_at -= 61
+            queue.submit("u1", "test", ["a"], FlakyHandler(), None)
+            return queue.get(old.id), queue.get(recent.id)
+        finally:
+            await queue.stop()
+
+    old, recent = asyncio.run(main())
+    assert old is None
+    assert recent is not None
+
+
+def test_retry_endpoint_runs_only_failed_steps(monkeypatch):
+    import main
+    from auth import get_current_user
+    from models import UserModel
+
+    user = UserModel(_id="507f1f77bcf86cd799439011", email="a@b.com", hashed_password="x")
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    queue = JobQueue(workers=1, max_attempts=2, ttl_seconds=60)
+    monkeypatch.setattr(main, "job_queue", queue)
+    handler = FlakyHandler({"b": 2})
+
+    async def scenario():
+        await queue.start()
+        try:
+            job = await wait_for(queue.submit(str(user.id), "test", ["a", "b", "c"], handler, None))
+            assert job.status == FAILED
+            handler.calls.clear()
+
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                # Another user's job is invisible
+                other = queue.submit("someone-else", "test", ["a"], FlakyHandler(), None)
+                assert (await client.post(f"/jobs/{other.id}/retry")).status_code == 404
+
+                response = await client.post(f"/jobs/{job.id}/retry")
+                assert response.status_code == 200
+                await wait_for(job)
+                # Only failed jobs can be retried
+                assert (await client.post(f"/jobs/{job.id}/retry")).status_code == 409
+                return job, (await client.get(f"/jobs/{job.id}")).json()
+        finally:
+            await queue.stop()
+
+    try:
+        job, status = asyncio.run(scenario())
+    finally:
+        main.app.dependency_overrides.clear()
+    assert handler.calls == ["b", "c"]
+    assert status["status"] == DONE
+    assert status["completed"] == 3
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from render_cache import RenderCache, outputs_size
+
+
+def outputs(n_bytes=100, errors=None):
+    return {
+        "validation": {"valid": not errors, "errors": list(errors or []), "warnings": []},
+        "facebook_feed": {"png": b"p" * n_bytes, "jpg": b"j" * n_bytes},
+    }
+
+
+class Compute:
+    """Counts calls; each call waits for `release` before returning (or raising) its result."""
+
+    def __init__(self, result=None, error=None):
+        self.result = result or outputs()
+        self.error = error
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_identical_calls_share_one_compute():
+    async def main():
+        cache = RenderCache(max_bytes=10**6)
+        compute = Compute()
+        first = asyncio.create_task(cache.get_or_compute("k", compute))
+        second = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        compute.release.set()
+        a, b = await asyncio.gather(first, second)
+        return cache, compute, a, b
+
+    cache, compute, a, b = asyncio.run(main())
+    assert compute.calls == 1
+    assert a == b == compute.result
+    assert a is not b
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == 1
+    assert cache.stats()["inflight"] == 0
+
+
+@pytest.mark.parametrize("cancelled", ["leader", "follower"])
+def test_cancelled_waiter_does_not_cancel_shared_compute(cancelled):
+    async def main():
+        cache = RenderCache(max_bytes=10**6)
+        compute = Compute()
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+
+        victim, survivor = (leader, follower) if cancelled == "leader" else (follower, leader)
+        victim.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await victim
+        compute.release.set()
+        result = await survivor
+        # The finished render is cached even though a waiter went away
+        await asyncio.sleep(0)
+        return cache, compute, result
+
+    cache, compute, result = asyncio.run(main())
+    assert compute.calls == 1
+    assert result == compute.result
+    assert cache.get("k") == compute.result
+
+
+def test_failed_compute_is_not_cached():
+    async def main():
+        cache = RenderCache(max_bytes=10**6)
+        failing = Compute(error=RuntimeError("render failed"))
+        failing.release.set()
+        leader = asyncio.create_task(cache.get_or_compute("k", failing))
+        follower = asyncio.create_task(cache.get_or_compute("k", failing))
+        results = await asyncio.gather(leader, follower, return_exceptions=True)
+
+        retry = Compute()
+        retry.release.set()
+        return cache, results, retry, await cache.get_or_compute("k", retry)
+
+    cache, results, retry, result = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert retry.calls == 1
+    assert result == retry.result
+    assert cache.stats()["inflight"] == 0
+
+
+def test_evicts_least_recently_used_by_size():
+    item = outputs(n_bytes=1000)
+    cache = RenderCache(max_bytes=3 * outputs_size(item))
+    for key in ("a", "b", "c"):
+        cache.put(key, item)
+    cache.get("a")
+    cache.put("d", item)
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ("a", "c", "d"))
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+    # Larger than the whole cache: not stored, nothing evicted
+    cache.put("huge", outputs(n_bytes=10**5))
+    assert cache.get("huge") is None
+    assert cache.stats()["items"] == 3
+
+
+def test_callers_cannot_mutate_cached_validation():
+    cache = RenderCache(max_bytes=10**6)
+    cache.put("k", outputs(errors=["[E001] bad"]))
+    first = cache.get("k")
+    first["validation"]["errors"].append("annotated")
+    first["facebook_feed"]["url"] = "http://x"
+    second = cache.get("k")
+    assert second["validation"]["errors"] == ["[E001] bad"]
+    assert "url" not in second["facebook_feed"]
@@ -1,7 +1,22 @@
+import copy
+import hashlib
+import os
 import re
+import threading
 import cv2
 import numpy as np
+from collections import OrderedDict
 from compliance_rules import FORBIDDEN_TERMS, REQUIRED_TEXT_PATTERNS, PRICE_PATTERNS, ERROR_CODES, TILE_SCHEMAS, LEP_TEMPLATE_RULES
+from image_hash import content_hash
+from compliance_engine import compliance_engine
+import detector
+
+# --- CONFIG ---
+# Image compliance results remembered per packshot content hash (entries are tiny dicts)
+IMAGE_VALIDATION_CACHE_SIZE = int(os.getenv("IMAGE_VALIDATION_CACHE_SIZE", "1024"))
+
+_image_results = OrderedDict()
+_image_results_lock = threading.Lock()
 
 def validate_spec(spec):
     """
@@ -103,17 +118,29 @@ def validate_text_content(main_message, sub_message, cta_text):
     if "*" in combined_text:
         errors.append(f"[{ERROR_CODES['FORBIDDEN_TERM']}] Asterisks (*) are strictly forbidden. No fine print allowed.")
 
-    # 1. Dictionary Forbidden Terms Check (Rule 1-8)
-    for category, terms in FORBIDDEN_TERMS.items():
-        for term in terms:
-            if term in combined_text:
-                errors.append(f"[{ERROR_CODES['FORBIDDEN_TERM']}] Forbidden term '{term}' detected ({category}).")
-            
-    # 2. Price/Discount Check (Rule 6)
-    for pattern in PRICE_PATTERNS:
-        if re.search(pattern, combined_text):
-             errors.append(f"[{ERROR_CODES['FORBIDDEN_TERM']}] Price call-outs, discounts, or money-off references are NOT allowed.")
-             break
+    # 1-2. Forbidden Terms (Rule 1-8) and Price/Discount (Rule 6) in one pass over the text
+    hits = compliance_engine.scan(combined_text)
+    fields = [("main_message", main_message), ("sub_message", sub_message), ("cta_text", cta_text)]
+    # Report spans relative to the field each hit starts in
+    starts = []
+    offset = 0
+    for name, value in fields:
+        starts.append((offset, name))
+        offset += len(f"{value}") + 1
+    for hit in hits:
+        field_start, hit["field"] = next(fs for fs in reversed(starts) if fs[0] <= hit["start"])
+        hit["text"] = combined_text[hit["start"]:hit["end"]]
+        hit["start"] -= field_start
+        hit["end"] -= field_start
+
+    reported = set()
+    for hit in hits:
+        if hit["category"] == "price" or hit["term"] in reported:
+            continue
+        reported.add(hit["term"])
+        errors.append(f"[{hit['code']}] Forbidden term '{hit['term']}' detected ({hit['category']}).")
+    if any(hit["category"] == "price" for hit in hits):
+        errors.append(f"[{ERROR_CODES['FORBIDDEN_TERM']}] Price call-outs, discounts, or money-off references are NOT allowed.")
 
     # 3. Mandatory Tags Check (Rule 9)
     # Check Clubcard Mandatory Text & Date Format
@@ -134,13 +161,53 @@ def validate_text_content(main_message, sub_message, cta_text):
     # 4. CTA Validation
     # If explicitly detecting auto-generated 'Shop Now' without user intent - we assume validator receives user intent.
     
-    return {"valid": len(errors) == 0, "errors": errors, "warnings": warnings}
+    return {"valid": len(errors) == 0, "errors": errors, "warnings": warnings, "hits": hits}
 
 def validate_image_content(image_obj):
     """
     Detects people and alcohol bottles in the image using OpenCV.
-    Returns a dict with status and flags.
+    Returns a dict with status and flags (plus "boxes" of what was detected).
+    Results are memoized per image content hash, so colour variants, formats and repeat
+    uploads of a known packshot reuse the first analysis.
     """
+    key = None
+    try:
+        if hasattr(image_obj, 'read'):
+            image_bytes = image_obj.read()
+            image_obj.seek(0)
+            key = "bytes:" + hashlib.sha256(image_bytes).hexdigest()
+        elif hasattr(image_obj, 'resize'):
+            key = content_hash(image_obj, namespace="validate")
+    except Exception:
+        pass
+
+    if key is not None:
+        with _image_results_lock:
+            cached = _image_results.get(key)
+            if cached is not None:
+                _image_results.move_to_end(key)
+                return copy.deepcopy(cached)
+
+    result, ok = _analyze_image(image_obj)
+
+    # Don't remember results of an analysis that errored out
+    if key is not None and ok:
+        with _image_results_lock:
+            _image_results[key] = copy.deepcopy(result)
+            while len(_image_results) > IMAGE_VALIDATION_CACHE_SIZE:
+                _image_results.popitem(last=False)
+    return result
+
+def clear_image_validation_cache():
+    with _image_results_lock:
+        _image_results.clear()
+
+def image_validation_stats():
+    with _image_results_lock:
+        return {"items": len(_image_results), "max_items": IMAGE_VALIDATION_CACHE_SIZE}
+
+def _analyze_image(image_obj):
+    """Uncached validate_image_content. Returns (result, ok); ok is False if analysis raised."""
     try:
         # distinct conversion if it's PIL or bytes
         img = None
@@ -164,83 +231,49 @@ def validate_image_content(image_obj):
                  img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
 
         if img is not None:
+             # Face + bottle detection share one grayscale conversion (bottles on a downscaled copy)
+             found = detector.analyze(img)
+
              # 1. Human Detection
-             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-             # Load face cascade
-             face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-             
-             # Higher threshold to reduce false positives (Set to 10 for strictness as requested)
-             faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=10, minSize=(40, 40))
-             
-             if len(faces) > 0:
+             if found["faces"]:
                  return {
                      "valid": False, 
                      "requires_confirmation": True, 
                      "type": "people",
-                     "message": f"[{ERROR_CODES['PEOPLE_DETECTED']}] Human detected in image. Compliance confirmation required."
-                 }
+                     "message": f"[{ERROR_CODES['PEOPLE_DETECTED']}] Human detected in image. Compliance confirmation required.",
+                     "boxes": found["faces"],
+                 }, True
             
              # 2. Alcohol/Bottle Detection
-             if detect_bottles(img):
+             if found["bottle"] is not None:
                  return {
                      "valid": False,
                      "requires_compliance": True,
                      "type": "alcohol",
-                     "message": f"[{ERROR_CODES['ALCOHOL_LOCKUP']}] Alcohol product visual detected. Mandatory Drinkaware compliance required."
-                 }
+                     "message": f"[{ERROR_CODES['ALCOHOL_LOCKUP']}] Alcohol product visual detected. Mandatory Drinkaware compliance required.",
+                     "boxes": [found["bottle"]],
+                 }, True
 
     except Exception as e:
         print(f"Image validation error: {e}")
-        pass
+        return {"valid": True, "requires_confirmation": False, "requires_compliance": False}, False
 
-    return {"valid": True, "requires_confirmation": False, "requires_compliance": False}
+    return {"valid": True, "requires_confirmation": False, "requires_compliance": False}, True
 
 def detect_bottles(img):
     """
     Heuristic bottle detection using contour analysis.
     Refined for better recall (catching more bottles) while maintaining precision.
     """
+    return find_bottle(img) is not None
+
+def find_bottle(img):
+    """detect_bottles, returning the [x, y, w, h] box of the first bottle-like contour (or None)."""
     try:
-        height, width, _ = img.shape
-        img_area = height * width
-        
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # 1. Edge Detection (Canny) 
-        edges = cv2.Canny(gray, 50, 150)
-        
-        # Dilation to close gaps
-        kernel = np.ones((5,5),np.uint8)
-        dilated = cv2.dilate(edges, kernel, iterations=2)
-        
-        contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        for cnt in contours:
-            area = cv2.contourArea(cnt)
-            
-            # Filter noise (0.5% area) and full-screen backgrounds (>90% area)
-            if area < (img_area * 0.005) or area > (img_area * 0.9): 
-                continue
-                
-            x, y, w, h = cv2.boundingRect(cnt)
-            aspect_ratio = float(h) / w
-            
-            # Bottles are vertically oriented.
-            # Range 1.5 (stout) to 6.5 (tall)
-            if 1.5 < aspect_ratio < 6.5:
-                # Rectangularity check: extent
-                rect_area = w * h
-                extent = float(area) / rect_area
-                
-                # Bottles have necks, so they fill less of their bounding rect than a box.
-                # 0.4 - 0.85 allows for various bottle shapes.
-                if 0.4 < extent < 0.85:
-                    return True
-                
+        return detector.find_bottle(detector.WorkingImage(img))
     except Exception as e:
         print(f"Bottle detection error: {e}")
-        
-    return False
+    return None
 
 def validate_layout(fmt, width, height, elements):
     # Placeholder for geometric validation (e.g. is logo top_right?)
@@ -0,0 +1,54 @@
+import io
+import time
+import zipfile
+
+
+class _Sink(io.RawIOBase):
+    """
+    Write-only, unseekable file object that buffers whatever zipfile writes until drained.
+    Being unseekable makes zipfile emit data descriptors instead of seeking back to patch
+    headers, which is what lets the archive be streamed.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_zip(entries):
+    """
+    Async generator of zip archive bytes built on the fly.
+    `entries` is an async iterable of (archive_name, async_iterable_of_bytes); each file is
+    copied through chunk by chunk, so memory stays at about one chunk regardless of archive
+    size. Files are stored uncompressed (PNG/JPEG don't shrink), as Zip64 so size is unbounded.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        async for name, chunks in entries:
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            with zf.open(info, mode="w", force_zip64=True) as dest:
+                async for chunk in chunks:
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    # Central directory, written on close
+    yield sink.drain()
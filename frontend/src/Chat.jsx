@@ -371,7 +371,7 @@ export default function Chat() {
             )}
 
             {Object.entries(images)
-              .filter(([k]) => k !== 'validation')
+              .filter(([k]) => k !== 'validation' && k !== 'cloud_job')
               .map(([fmt, data]) => {
                 const imgSrc = typeof data === 'string' ? data : (data ? (data.png || data.jpg) : null);
                 if (!imgSrc) return null;
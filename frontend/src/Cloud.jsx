@@ -1,32 +1,87 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { useAuth } from "./AuthContext";
 import styles from "./styles.js";
 
+const CLOUD_URL = "http://127.0.0.1:8000/cloud-images";
+const POLL_MS = 15000;
+
 export default function Cloud() {
   const { token, user } = useAuth();
   const [images, setImages] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const etagRef = useRef(null);
+  const pagedRef = useRef(false);
 
   useEffect(() => {
     if (token) {
-      fetchImages();
+      setLoading(true);
+      fetchImages().finally(() => setLoading(false));
+      // Poll the newest page; unchanged pages come back as a bodyless 304
+      const timer = setInterval(fetchImages, POLL_MS);
+      return () => clearInterval(timer);
     }
   }, [token]);
 
   const fetchImages = async () => {
-    setLoading(true);
     try {
-      const res = await fetch("http://127.0.0.1:8000/cloud-images", {
+      const headers = { Authorization: `Bearer ${token}` };
+      if (etagRef.current) headers["If-None-Match"] = etagRef.current;
+      const res = await fetch(CLOUD_URL, { headers });
+      if (res.status === 304) return;
+      if (res.ok) {
+        etagRef.current = res.headers.get("ETag");
+        const data = await res.json();
+        if (pagedRef.current) {
+          // Older pages are already loaded: put the fresh first page on top, keep the rest
+          const ids = new Set(data.images.map((img) => img._id));
+          setImages((prev) => [...data.images, ...prev.filter((img) => !ids.has(img._id))]);
+        } else {
+          setImages(data.images);
+          setNextCursor(data.next_cursor);
+        }
+      }
+    } catch (e) {
+      console.error(e);
+    }
+  };
+
+  const fetchMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await fetch(`${CLOUD_URL}?cursor=${encodeURIComponent(nextCursor)}`, {
         headers: { Authorization: `Bearer ${token}` }
       });
       if (res.ok) {
         const data = await res.json();
-        setImages(data);
+        setImages((prev) => [...prev, ...data.images]);
+        setNextCursor(data.next_cursor);
+        pagedRef.current = true;
       }
     } catch (e) {
       console.error(e);
     } finally {
-      setLoading(false);
+      setLoadingMore(false);
+    }
+  };
+
+  // One request for the whole batch; the server streams the zip from storage
+  const downloadBatch = async (batchId) => {
+    try {
+      const res = await fetch(`http://127.0.0.1:8000/batches/${batchId}/download`, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      if (!res.ok) return;
+      const url = URL.createObjectURL(await res.blob());
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `batch_${batchId}.zip`;
+      a.click();
+      URL.revokeObjectURL(url);
+    } catch (e) {
+      console.error(e);
     }
   };
 
@@ -54,8 +109,8 @@ export default function Cloud() {
     return acc;
   }, {});
 
-  // Sort batches by creation? (Assuming backend sort, or reverse keys)
-  const sortedBatches = Object.entries(batchedImages).reverse();
+  // Backend returns newest first, and object keys keep insertion order
+  const sortedBatches = Object.entries(batchedImages);
 
   return (
     <div style={styles.page}>
@@ -86,6 +141,17 @@ export default function Cloud() {
                 <h2 style={{ fontSize: '1.2rem', margin: 0, color: '#333' }}>
                   Campaign Set <span style={{ fontWeight: 'normal', color: '#777', fontSize: '0.9rem' }}>({group.color})</span>
                 </h2>
+                {batchId !== 'legacy' && (
+                  <button
+                    onClick={() => downloadBatch(batchId)}
+                    style={{
+                      marginLeft: 'auto', color: '#0070f3', fontSize: '12px', background: 'white',
+                      border: '1px solid #ccc', padding: '4px 8px', borderRadius: '4px', cursor: 'pointer'
+                    }}
+                  >
+                    Download all (.zip)
+                  </button>
+                )}
               </div>
 
               <div style={{
@@ -143,6 +209,11 @@ export default function Cloud() {
               </div>
             </div>
           ))}
+          {nextCursor && (
+            <button onClick={fetchMore} disabled={loadingMore} style={{ ...styles.button, alignSelf: 'center' }}>
+              {loadingMore ? 'Loading...' : 'Load more'}
+            </button>
+          )}
           {images.length === 0 && <p style={{ textAlign: 'center', color: '#666' }}>No campaigns found. Start creating!</p>}
         </div>
       )}